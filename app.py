@@ -1,25 +1,36 @@
+import time
+_run_started = time.perf_counter()
+
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 from streamlit_option_menu import option_menu
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, date, timedelta
-import pandas as pd
+import re
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(__file__))
 from utils.data_manager import (
-    load_data, save_data, create_task, add_task,
-    update_task, delete_task, add_comment, update_partners,
+    load_data, create_task, add_task,
+    update_task, delete_task, get_task, add_comment, get_comments, update_partners,
     get_partner_names, get_partner_email,
     create_client, add_client, update_client, delete_client,
-    get_client, add_meeting_to_client, get_client_names
+    get_client, add_meeting_to_client, get_meetings, get_client_names,
+    get_client_tasks, get_client_task_counts,
+    list_backups, restore_backup, backup_status, query_tasks, ConflictError,
+    get_task_stats, count_overdue_tasks, upcoming_tasks, search_records, get_data_version,
+    archive_done_tasks, get_archived_tasks, search_archive, restore_archived_task,
+    ARCHIVE_AFTER_DAYS
 )
+from utils import export, importer, instrument
 from utils.helpers import (
     get_priority_color, get_status_color, format_date,
-    is_overdue, days_until_due, get_due_date_badge
+    is_overdue, get_due_date_badge, parse_date, today_ordinal
 )
 
+# Only the first run of a process actually imports anything
+instrument.note_startup("imports", time.perf_counter() - _run_started)
+
 # Page config
 st.set_page_config(
     page_title="Climaterix Task Manager",
@@ -29,8 +40,7 @@ st.set_page_config(
 )
 
 # Custom CSS with Climetrix branding (using Streamlit default fonts)
-st.markdown("""
-<style>
+PAGE_CSS = """
     .logo-container {
         display: flex;
         align-items: center;
@@ -163,85 +173,199 @@ st.markdown("""
     [data-testid="stSidebar"] {
         background: rgba(255, 255, 255, 0.95);
     }
-</style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource(show_spinner=False)
+def page_style() -> str:
+    """PAGE_CSS as a minified <style> tag, built once per process"""
+    css = re.sub(r"/\*.*?\*/", "", PAGE_CSS, flags=re.S)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return "<style>" + re.sub(r"\s+", " ", css).strip() + "</style>"
+
+st.markdown(page_style(), unsafe_allow_html=True)
 
 # Initialize session state
 if "edit_task_id" not in st.session_state:
     st.session_state.edit_task_id = None
+if "edit_task_version" not in st.session_state:
+    st.session_state.edit_task_version = None
 if "show_new_task" not in st.session_state:
     st.session_state.show_new_task = False
 if "new_task_client" not in st.session_state:
     st.session_state.new_task_client = None
+if "page_size" not in st.session_state:
+    st.session_state.page_size = 25
+if "lazy_details" not in st.session_state:
+    st.session_state.lazy_details = True
+if "open_task_id" not in st.session_state:
+    st.session_state.open_task_id = None
+
+# Date ordinal of today, taken once per rerun for badges and overdue checks
+st.session_state.today = today_ordinal()
+
+PAGE_SIZES = [10, 25, 50, 100]
+
+# Dashboard figure sets kept; a few versions back covers sessions that lag behind
+CHART_CACHE_ENTRIES = 8
+
+def set_state(key, value):
+    st.session_state[key] = value
+
+# Task cards, Kanban columns and client panels are fragments: a widget inside one
+# reruns only that fragment. Streamlit before 1.37 has no fragments, there every
+# interaction reruns the whole app as before.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+
+# Comments and meetings are read from storage only for sections that are open.
+# Streamlit reports whether an expander or tab is open since 1.52 (with
+# on_change="rerun"); before that every section counts as open.
+def tracked(section, *args, key, **kwargs):
+    """st.expander or st.tabs, tracking whether it is open where Streamlit can"""
+    try:
+        return section(*args, key=key, on_change="rerun", **kwargs)
+    except TypeError:
+        return section(*args, **kwargs)
+
+def section_open(section) -> bool:
+    return getattr(section, "open", None) is not False
+
+def rerun_fragment():
+    """Rerun the calling fragment, or the app where that isn't possible"""
+    try:
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):  # No scope before 1.37, or not in a fragment run
+        st.rerun()
+
+def request_app_rerun():
+    """From a widget callback inside a fragment: the change affects more than the fragment"""
+    st.session_state.rerun_app = True
+
+def check_app_rerun():
+    """Called first in every fragment, turns a requested app rerun into one"""
+    if st.session_state.pop("rerun_app", False):
+        st.rerun()
+
+# Widget callbacks receive the record version that was on screen (bound when the
+# widget rendered), so updates are conditional on nobody having changed it since.
+def start_edit(task_id, version):
+    st.session_state.edit_task_id = task_id
+    st.session_state.edit_task_version = version
+    request_app_rerun()
+
+def change_status(task_id, version, page_wide=False):
+    try:
+        update_task(task_id, {"status": st.session_state[f"status_{task_id}"]}, expected_version=version)
+    except ConflictError:
+        task = get_task(task_id)
+        if task:
+            st.session_state[f"status_{task_id}"] = task["status"]
+        st.toast("Someone else changed this task first, showing their version")
+        return
+    if page_wide:
+        request_app_rerun()
+
+def toggle_details(task_id):
+    previous = st.session_state.open_task_id
+    st.session_state.open_task_id = None if previous == task_id else task_id
+    if previous not in (None, task_id):
+        request_app_rerun()  # The other open card has to close
+
+@fragment
+@instrument.timed()
+def render_task_card(task, show_status=True, page_wide=False):
+    """Render a task card with all details.
+
+    page_wide: the page groups or filters tasks by status, so a status change
+    reruns the app instead of just the card.
+    """
+    check_app_rerun()
+    # A fragment rerun gets the arguments of the last full run, fetch the current task
+    task = get_task(task.id)
+    if task is None:
+        return
 
-def render_task_card(task, show_status=True):
-    """Render a task card with all details"""
-    priority_color = get_priority_color(task["priority"])
-    status_color = get_status_color(task["status"])
-    due_text, due_color = get_due_date_badge(task.get("due_date"), task["status"])
-    is_task_overdue = is_overdue(task.get("due_date")) and task["status"] != "Done"
+    priority_color = get_priority_color(task.priority)
+    status_color = get_status_color(task.status)
+    due_text, due_color = get_due_date_badge(task.due_ordinal, task.status, st.session_state.today)
+    is_task_overdue = is_overdue(task.due_ordinal, st.session_state.today) and task.status != "Done"
 
     card_class = "task-card overdue" if is_task_overdue else "task-card"
 
     with st.container():
         st.markdown(f"""
         <div class="{card_class}" style="border-left-color: {priority_color};">
-            <div class="task-title">{task['title']}</div>
+            <div class="task-title">{task.title}</div>
             <div class="task-meta">
-                <span class="priority-badge" style="background: {priority_color};">{task['priority']}</span>
-                {'<span class="priority-badge" style="background: ' + status_color + '; margin-left: 5px;">' + task['status'] + '</span>' if show_status else ''}
+                <span class="priority-badge" style="background: {priority_color};">{task.priority}</span>
+                {'<span class="priority-badge" style="background: ' + status_color + '; margin-left: 5px;">' + task.status + '</span>' if show_status else ''}
                 <span style="margin-left: 10px; color: {due_color};">{due_text}</span>
             </div>
             <div class="task-meta" style="margin-top: 5px;">
-                👤 {task.get('assignee', 'Avi')} | 📁 {task.get('category', 'General')}{' | 🏢 ' + task.get('client') if task.get('client') else ''}
+                👤 {task.assignee} | 📁 {task.category}{' | 🏢 ' + task.client if task.client else ''}{f' | 💬 {task.comment_count}' if task.comment_count else ''}
             </div>
         </div>
         """, unsafe_allow_html=True)
 
-        # Expandable details
-        with st.expander("View Details", expanded=False):
-            if task.get("description"):
-                st.markdown(f"**Description:** {task['description']}")
+        if st.session_state.lazy_details:
+            # Details and their widgets only exist for the one open card
+            is_open = st.session_state.open_task_id == task.id
+            st.button(
+                "Hide Details" if is_open else "View Details",
+                key=f"details_{task.id}",
+                on_click=toggle_details,
+                args=(task.id,)
+            )
+            if is_open:
+                render_task_details(task, page_wide)
+        else:
+            with tracked(st.expander, "View Details", expanded=False, key=f"expander_{task.id}") as details:
+                if section_open(details):
+                    render_task_details(task, page_wide)
 
-            if task.get("meeting_summary"):
-                st.markdown(f"**Meeting Summary:** {task['meeting_summary']}")
+@instrument.timed()
+def render_task_details(task, page_wide=False):
+    """Render the description, links, comments and actions of a task"""
+    if task.description:
+        st.markdown(f"**Description:** {task.description}")
 
-            if task.get("links"):
-                st.markdown("**Links:**")
-                for link in task["links"]:
-                    st.markdown(f"- [{link}]({link})")
+    if task.meeting_summary:
+        st.markdown(f"**Meeting Summary:** {task.meeting_summary}")
 
-            if task.get("comments"):
-                st.markdown("**Comments:**")
-                for comment in task["comments"]:
-                    st.markdown(f"- {comment['text']} _{comment['author']} - {format_date(comment['created_at'])}_")
+    if task.links:
+        st.markdown("**Links:**")
+        for link in task.links:
+            st.markdown(f"- [{link}]({link})")
 
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                if st.button("Edit", key=f"edit_{task['id']}", use_container_width=True):
-                    st.session_state.edit_task_id = task["id"]
-                    st.rerun()
-            with col2:
-                new_status = st.selectbox(
-                    "Status",
-                    ["To Do", "In Progress", "Done"],
-                    index=["To Do", "In Progress", "Done"].index(task["status"]),
-                    key=f"status_{task['id']}",
-                    label_visibility="collapsed"
-                )
-                if new_status != task["status"]:
-                    update_task(task["id"], {"status": new_status})
-                    st.rerun()
-            with col3:
-                if st.button("Delete", key=f"delete_{task['id']}", type="secondary", use_container_width=True):
-                    delete_task(task["id"])
-                    st.rerun()
+    if task.comment_count:
+        st.markdown("**Comments:**")
+        for comment in get_comments(task.id):
+            st.markdown(f"- {comment.text} _{comment.author} - {format_date(comment.created_at)}_")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.button("Edit", key=f"edit_{task.id}", use_container_width=True,
+                  on_click=start_edit, args=(task.id, task.version))
+    with col2:
+        st.selectbox(
+            "Status",
+            ["To Do", "In Progress", "Done"],
+            index=["To Do", "In Progress", "Done"].index(task.status),
+            key=f"status_{task.id}",
+            label_visibility="collapsed",
+            on_change=change_status,
+            args=(task.id, task.version, page_wide)
+        )
+    with col3:
+        if st.button("Delete", key=f"delete_{task.id}", type="secondary", use_container_width=True):
+            delete_task(task.id)
+            st.rerun()  # Counts and pages around the card change too
 
+@instrument.timed()
 def render_task_form(task=None, default_client=None):
     """Render form for creating/editing a task"""
     data = load_data()
     partner_names = get_partner_names(data)
-    client_names = get_client_names(data)
+    client_names = {c["id"]: c["name"] for c in data.get("clients", [])}
     is_edit = task is not None
 
     st.subheader("Edit Task" if is_edit else "New Task")
@@ -270,17 +394,18 @@ def render_task_form(task=None, default_client=None):
             )
             due_date = st.date_input(
                 "Due Date",
-                value=datetime.fromisoformat(task["due_date"]).date() if task and task.get("due_date") else None
+                value=parse_date(task.get("due_date")) if task else None
             )
 
         # Client selection
-        client_options = ["No Client"] + client_names
+        client_options = [""] + list(client_names)
         default_idx = 0
         if default_client and default_client in client_names:
             default_idx = client_options.index(default_client)
-        elif task and task.get("client") in client_names:
-            default_idx = client_options.index(task.get("client"))
-        client = st.selectbox("Client", client_options, index=default_idx)
+        elif task and task.get("client_id") in client_names:
+            default_idx = client_options.index(task.get("client_id"))
+        client_id = st.selectbox("Client", client_options, index=default_idx,
+                                 format_func=lambda c: client_names.get(c, "No Client"))
 
         meeting_summary = st.text_area(
             "Meeting Summary",
@@ -319,11 +444,17 @@ def render_task_form(task=None, default_client=None):
                     "due_date": due_date.isoformat() if due_date else None,
                     "meeting_summary": meeting_summary,
                     "links": links,
-                    "client": client if client != "No Client" else ""
+                    "client": client_names.get(client_id, ""),
+                    "client_id": client_id
                 }
 
                 if is_edit:
-                    update_task(task["id"], task_data)
+                    try:
+                        update_task(task["id"], task_data, expected_version=st.session_state.edit_task_version)
+                    except ConflictError:
+                        st.session_state.edit_task_version = task.get("version", 0)
+                        st.error("Someone else changed this task while you were editing. Save again to overwrite their changes.")
+                        return
                     st.session_state.edit_task_id = None
                 else:
                     new_task = create_task(**task_data)
@@ -333,12 +464,12 @@ def render_task_form(task=None, default_client=None):
                 st.success("Task saved!")
                 st.rerun()
 
+@instrument.timed()
 def render_kanban():
     """Render Kanban board view"""
     data = load_data()
     partner_names = get_partner_names(data)
     client_names = get_client_names(data)
-    tasks = data["tasks"]
 
     # Filters
     with st.expander("Filters", expanded=False):
@@ -352,43 +483,52 @@ def render_kanban():
         with col4:
             filter_client = st.multiselect("Client", client_names)
 
-    # Apply filters
-    if filter_assignee:
-        tasks = [t for t in tasks if t.get("assignee") in filter_assignee]
-    if filter_priority:
-        tasks = [t for t in tasks if t.get("priority") in filter_priority]
-    if filter_category:
-        tasks = [t for t in tasks if t.get("category") in filter_category]
-    if filter_client:
-        tasks = [t for t in tasks if t.get("client") in filter_client]
-
     # Kanban columns
     col1, col2, col3 = st.columns(3)
 
     statuses = ["To Do", "In Progress", "Done"]
     columns = [col1, col2, col3]
     colors = ["#2196F3", "#FF9800", "#4CAF50"]
+    filters = {"assignee": filter_assignee, "priority": filter_priority,
+               "category": filter_category, "client": filter_client}
 
     for col, status, color in zip(columns, statuses, colors):
         with col:
-            status_tasks = [t for t in tasks if t.get("status") == status]
-            st.markdown(f"""
-            <div class="status-column">
-                <div class="column-header" style="color: {color};">
-                    {status} <span style="background: {color}; color: white; padding: 2px 8px; border-radius: 10px; font-size: 0.8rem;">{len(status_tasks)}</span>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Sort by priority and due date
-            status_tasks.sort(key=lambda x: (
-                {"High": 0, "Medium": 1, "Low": 2}.get(x.get("priority"), 1),
-                days_until_due(x.get("due_date"))
-            ))
-
-            for task in status_tasks:
-                render_task_card(task, show_status=False)
+            render_kanban_column(status, color, filters)
+
+@fragment
+@instrument.timed()
+def render_kanban_column(status, color, filters):
+    """Render one Kanban column. Loading more cards reruns only the column."""
+    check_app_rerun()
+    # Filtered and sorted by priority and due date
+    status_tasks = query_tasks(status=[status], sort_by="priority_due", **filters)
+    st.markdown(f"""
+    <div class="status-column">
+        <div class="column-header" style="color: {color};">
+            {status} <span style="background: {color}; color: white; padding: 2px 8px; border-radius: 10px; font-size: 0.8rem;">{len(status_tasks)}</span>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Only the first window of each column gets widgets
+    window_key = f"kanban_window_{status}"
+    window = st.session_state.get(window_key, st.session_state.page_size)
+    for task in status_tasks[:window]:
+        # A status change moves the card to another column
+        render_task_card(task, show_status=False, page_wide=True)
+
+    remaining = len(status_tasks) - window
+    if remaining > 0:
+        st.button(
+            f"Load more ({remaining} remaining)",
+            key=f"load_more_{status}",
+            use_container_width=True,
+            on_click=set_state,
+            args=(window_key, window + st.session_state.page_size)
+        )
 
+@instrument.timed()
 def render_list_view():
     """Render list view with table"""
     data = load_data()
@@ -398,6 +538,7 @@ def render_list_view():
 
     if not tasks:
         st.info("No tasks yet. Create your first task!")
+        render_archive()
         return
 
     # Filters
@@ -413,47 +554,137 @@ def render_list_view():
     with col5:
         sort_by = st.selectbox("Sort by", ["Due Date", "Priority", "Created", "Title", "Client"])
 
-    # Apply filters
-    filtered = tasks.copy()
-    if filter_status:
-        filtered = [t for t in filtered if t.get("status") in filter_status]
-    if filter_assignee:
-        filtered = [t for t in filtered if t.get("assignee") in filter_assignee]
-    if filter_priority:
-        filtered = [t for t in filtered if t.get("priority") in filter_priority]
-    if filter_client:
-        filtered = [t for t in filtered if t.get("client") in filter_client]
-
-    # Sort
-    if sort_by == "Due Date":
-        filtered.sort(key=lambda x: days_until_due(x.get("due_date")))
-    elif sort_by == "Priority":
-        filtered.sort(key=lambda x: {"High": 0, "Medium": 1, "Low": 2}.get(x.get("priority"), 1))
-    elif sort_by == "Created":
-        filtered.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    elif sort_by == "Client":
-        filtered.sort(key=lambda x: x.get("client", "").lower())
-    else:
-        filtered.sort(key=lambda x: x.get("title", "").lower())
+    sort_orders = {
+        "Due Date": "due_date",
+        "Priority": "priority",
+        "Created": "created",
+        "Title": "title",
+        "Client": "client"
+    }
+    filtered = query_tasks(
+        status=filter_status,
+        assignee=filter_assignee,
+        priority=filter_priority,
+        client=filter_client,
+        sort_by=sort_orders[sort_by]
+    )
+
+    # Back to the first page whenever the filters or sort order change
+    list_query = (filter_status, filter_assignee, filter_priority, filter_client, sort_by)
+    if st.session_state.get("list_query") != list_query:
+        st.session_state.list_query = list_query
+        st.session_state.list_page = 0
+
+    page_size = st.session_state.page_size
+    pages = max(1, -(-len(filtered) // page_size))
+    page = min(st.session_state.get("list_page", 0), pages - 1)
+    start = page * page_size
 
     st.markdown(f"**Showing {len(filtered)} of {len(tasks)} tasks**")
 
-    for task in filtered:
-        render_task_card(task)
+    for task in filtered[start:start + page_size]:
+        render_task_card(task, page_wide=bool(filter_status))
+
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Previous", disabled=page == 0, use_container_width=True,
+                      on_click=set_state, args=("list_page", page - 1))
+        with col2:
+            st.markdown(f"<div style='text-align: center; padding-top: 0.5rem;'>Page {page + 1} of {pages}</div>",
+                        unsafe_allow_html=True)
+        with col3:
+            st.button("Next ▶", disabled=page >= pages - 1, use_container_width=True,
+                      on_click=set_state, args=("list_page", page + 1))
+
+    st.markdown("---")
+    render_archive()
 
+@instrument.timed()
+def render_archive():
+    """Render archived tasks with search and restore. The archive is only read once shown."""
+    if not st.toggle("📦 Show archived tasks", key="show_archive",
+                     help="Tasks that have been Done for a while, kept out of the board and list"):
+        return
+
+    archive_query = st.text_input("Search the archive", key="archive_query",
+                                  placeholder="Title, description, comments...").strip()
+    tasks = search_archive(archive_query, limit=200) if archive_query else get_archived_tasks()
+    if not tasks:
+        st.info("Nothing in the archive matches your search" if archive_query else "The archive is empty")
+        return
+
+    st.markdown(f"**{len(tasks)} archived tasks**")
+    window = st.session_state.get("archive_window", st.session_state.page_size)
+    for task in tasks[:window]:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.markdown(f"""
+            <div class="task-card" style="border-left-color: {get_status_color(task.status)};">
+                <div class="task-title">{task.title}</div>
+                <div class="task-meta">
+                    ✅ Completed {format_date(task.completed_at or task.updated_at)} | 👤 {task.assignee} | 📁 {task.category}{' | 🏢 ' + task.client if task.client else ''}
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+        with col2:
+            if st.button("Restore", key=f"restore_{task.id}", use_container_width=True):
+                restore_archived_task(task.id)
+                st.rerun()
+
+    remaining = len(tasks) - window
+    if remaining > 0:
+        st.button(
+            f"Load more ({remaining} remaining)",
+            key="archive_more",
+            use_container_width=True,
+            on_click=set_state,
+            args=("archive_window", window + st.session_state.page_size)
+        )
+
+# Figures are shared by every session and rebuilt only when the data version
+# (or the day, for anything date-relative) moves on
+@st.cache_resource(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+@instrument.timed()
+def dashboard_charts(version, today, _status_counts, _assignee_counts):
+    """Status pie and assignee bar for one data version"""
+    # Imported here so the other pages never pay for plotly
+    px = instrument.import_module("plotly.express")
+
+    status_fig = px.pie(
+        values=list(_status_counts.values()),
+        names=list(_status_counts.keys()),
+        color_discrete_sequence=["#2196F3", "#FF9800", "#4CAF50"]
+    )
+    status_fig.update_layout(margin=dict(t=0, b=0, l=0, r=0))
+
+    assignee_fig = px.bar(
+        x=list(_assignee_counts.keys()),
+        y=list(_assignee_counts.values()),
+        color_discrete_sequence=["#2563eb"]
+    )
+    assignee_fig.update_layout(
+        xaxis_title="Partner",
+        yaxis_title="Tasks",
+        margin=dict(t=0, b=0)
+    )
+    return status_fig, assignee_fig
+
+@instrument.timed()
 def render_dashboard():
     """Render dashboard overview with metrics"""
-    data = load_data()
-    tasks = data["tasks"]
+    # Read before the stats: a write in between makes the charts newer than their key, never older
+    version = get_data_version()
+    stats = get_task_stats()
 
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
 
-    total = len(tasks)
-    todo = len([t for t in tasks if t.get("status") == "To Do"])
-    in_progress = len([t for t in tasks if t.get("status") == "In Progress"])
-    done = len([t for t in tasks if t.get("status") == "Done"])
-    overdue = len([t for t in tasks if is_overdue(t.get("due_date")) and t.get("status") != "Done"])
+    total = stats["total"]
+    todo = stats["status"].get("To Do", 0)
+    in_progress = stats["status"].get("In Progress", 0)
+    done = stats["status"].get("Done", 0)
+    overdue = count_overdue_tasks(st.session_state.today)
 
     with col1:
         st.markdown(f"""
@@ -493,56 +724,40 @@ def render_dashboard():
     st.markdown("---")
 
     # Charts
-    if tasks:
+    if total:
+        status_counts = {"To Do": todo, "In Progress": in_progress, "Done": done}
+        status_fig, assignee_fig = dashboard_charts(
+            version, st.session_state.today, status_counts, dict(stats["assignee"])
+        )
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("Tasks by Status")
-            status_counts = {"To Do": todo, "In Progress": in_progress, "Done": done}
-            fig = px.pie(
-                values=list(status_counts.values()),
-                names=list(status_counts.keys()),
-                color_discrete_sequence=["#2196F3", "#FF9800", "#4CAF50"]
-            )
-            fig.update_layout(margin=dict(t=0, b=0, l=0, r=0))
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(status_fig, use_container_width=True)
 
         with col2:
             st.subheader("Tasks by Assignee")
-            assignee_counts = {}
-            for task in tasks:
-                assignee = task.get("assignee") or "Unassigned"
-                assignee_counts[assignee] = assignee_counts.get(assignee, 0) + 1
-
-            fig = px.bar(
-                x=list(assignee_counts.keys()),
-                y=list(assignee_counts.values()),
-                color_discrete_sequence=["#2563eb"]
-            )
-            fig.update_layout(
-                xaxis_title="Partner",
-                yaxis_title="Tasks",
-                margin=dict(t=0, b=0)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(assignee_fig, use_container_width=True)
 
         # Upcoming tasks
         st.subheader("Upcoming Deadlines")
-        upcoming = [t for t in tasks if t.get("due_date") and t.get("status") != "Done"]
-        upcoming.sort(key=lambda x: x.get("due_date"))
+        upcoming = upcoming_tasks(5)
 
-        if upcoming[:5]:
-            for task in upcoming[:5]:
-                due_text, due_color = get_due_date_badge(task.get("due_date"), task["status"])
-                st.markdown(f"- **{task['title']}** - {due_text} ({'👤 ' + task.get('assignee', 'Unassigned')})")
+        if upcoming:
+            for task in upcoming:
+                due_text, due_color = get_due_date_badge(task.due_ordinal, task.status, st.session_state.today)
+                st.markdown(f"- **{task.title}** - {due_text} ({'👤 ' + (task.assignee or 'Unassigned')})")
         else:
             st.info("No upcoming deadlines")
 
+def remember_client_version(version):
+    st.session_state.client_edit_version = version
+
+@instrument.timed()
 def render_clients():
     """Render potential clients page"""
     data = load_data()
     clients = data.get("clients", [])
-    tasks = data["tasks"]
 
     # Add new client section
     with st.expander("➕ Add New Client", expanded=False):
@@ -580,7 +795,7 @@ def render_clients():
         default=["Lead", "Contacted", "Meeting", "Proposal", "Negotiation"]
     )
 
-    filtered_clients = [c for c in clients if c.get("status") in status_filter]
+    filtered_clients = [c for c in clients if c.status in status_filter]
 
     if not filtered_clients:
         st.info("No clients yet. Add your first potential client above!")
@@ -590,102 +805,121 @@ def render_clients():
 
     # Display clients
     for client in filtered_clients:
-        client_tasks = [t for t in tasks if t.get("client") == client["name"]]
-        pending_tasks = len([t for t in client_tasks if t.get("status") != "Done"])
-
-        status_colors = {
-            "Lead": "#9E9E9E",
-            "Contacted": "#2196F3",
-            "Meeting": "#FF9800",
-            "Proposal": "#9C27B0",
-            "Negotiation": "#FF5722",
-            "Won": "#4CAF50",
-            "Lost": "#F44336"
-        }
-        status_color = status_colors.get(client.get("status"), "#9E9E9E")
-
-        st.markdown(f"""
-        <div style="background: white; border-radius: 10px; padding: 1rem; margin-bottom: 1rem; border-left: 4px solid {status_color}; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <div>
-                    <strong style="font-size: 1.1rem;">{client['name']}</strong>
-                    <span style="background: {status_color}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 0.75rem; margin-left: 10px;">{client.get('status', 'Lead')}</span>
-                </div>
-                <div style="color: #666; font-size: 0.85rem;">
-                    📋 {len(client_tasks)} tasks ({pending_tasks} pending)
-                </div>
+        render_client_panel(client, status_filter)
+
+@fragment
+@instrument.timed()
+def render_client_panel(client, status_filter):
+    """Render a client with its tasks, meetings and details.
+
+    The panel is a fragment: saving a meeting or details reruns only the panel.
+    """
+    check_app_rerun()
+    # A fragment rerun gets the arguments of the last full run, fetch the current client
+    client = get_client(client.id)
+    if client is None:
+        return
+    task_counts = get_client_task_counts(client.id)
+
+    status_colors = {
+        "Lead": "#9E9E9E",
+        "Contacted": "#2196F3",
+        "Meeting": "#FF9800",
+        "Proposal": "#9C27B0",
+        "Negotiation": "#FF5722",
+        "Won": "#4CAF50",
+        "Lost": "#F44336"
+    }
+    status_color = status_colors.get(client.status, "#9E9E9E")
+
+    st.markdown(f"""
+    <div style="background: white; border-radius: 10px; padding: 1rem; margin-bottom: 1rem; border-left: 4px solid {status_color}; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <div>
+                <strong style="font-size: 1.1rem;">{client.name}</strong>
+                <span style="background: {status_color}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 0.75rem; margin-left: 10px;">{client.status}</span>
             </div>
-            <div style="color: #666; font-size: 0.85rem; margin-top: 5px;">
-                👤 {client.get('contact_name', 'N/A')} | 📧 {client.get('contact_email', 'N/A')} | 📞 {client.get('phone', 'N/A')}
+            <div style="color: #666; font-size: 0.85rem;">
+                📋 {task_counts['total']} tasks ({task_counts['pending']} pending){f" | 🗓 {client.meeting_count} meetings" if client.meeting_count else ""}
             </div>
         </div>
-        """, unsafe_allow_html=True)
-
-        with st.expander(f"Manage {client['name']}", expanded=False):
-            tab1, tab2, tab3 = st.tabs(["Tasks", "Meetings", "Details"])
-
-            with tab1:
-                # Show client tasks
-                if client_tasks:
-                    for task in client_tasks:
-                        render_task_card(task)
-                else:
-                    st.info("No tasks for this client yet")
+        <div style="color: #666; font-size: 0.85rem; margin-top: 5px;">
+            👤 {client.contact_name or 'N/A'} | 📧 {client.contact_email or 'N/A'} | 📞 {client.phone or 'N/A'}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    with tracked(st.expander, f"Manage {client['name']}", expanded=False, key=f"manage_{client.id}") as manage:
+        # The tabs, and the linked task cards in them, are only built while the panel is open
+        if not section_open(manage):
+            return
+        tab1, tab2, tab3 = tracked(st.tabs, ["Tasks", "Meetings", "Details"], key=f"client_tabs_{client.id}")
+
+        with tab1:
+            # Show client tasks
+            if task_counts["total"]:
+                for task in get_client_tasks(client["id"]):
+                    # A status change alters the pending count in the panel header
+                    render_task_card(task, page_wide=True)
+            else:
+                st.info("No tasks for this client yet")
 
-                # Quick add task button
-                if st.button(f"➕ Add Task for {client['name']}", key=f"add_task_{client['id']}"):
-                    st.session_state.show_new_task = True
-                    st.session_state.new_task_client = client["name"]
-                    st.rerun()
+            # Quick add task button
+            if st.button(f"➕ Add Task for {client['name']}", key=f"add_task_{client['id']}"):
+                st.session_state.show_new_task = True
+                st.session_state.new_task_client = client["id"]
+                st.rerun()
 
-            with tab2:
-                # Meeting history
-                meetings = client.get("meetings", [])
-                if meetings:
-                    for meeting in sorted(meetings, key=lambda x: x.get("date", ""), reverse=True):
-                        st.markdown(f"""
-                        <div style="background: #f5f5f5; padding: 0.8rem; border-radius: 8px; margin-bottom: 0.5rem;">
-                            <strong>{format_date(meeting.get('date', ''))}</strong><br>
-                            <span style="color: #333;">{meeting.get('summary', '')}</span>
-                            {f"<br><em style='color: #666;'>Next steps: {meeting.get('next_steps', '')}</em>" if meeting.get('next_steps') else ''}
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.info("No meetings recorded yet")
-
-                # Add meeting form
-                st.markdown("**Add Meeting**")
-                with st.form(f"meeting_form_{client['id']}"):
-                    meeting_date = st.date_input("Date", value=date.today())
-                    meeting_summary = st.text_area("Summary")
-                    meeting_next = st.text_area("Next Steps")
-
-                    if st.form_submit_button("Save Meeting"):
-                        if meeting_summary:
-                            add_meeting_to_client(client["id"], meeting_summary, meeting_date.isoformat(), meeting_next)
-                            st.success("Meeting saved!")
-                            st.rerun()
-
-            with tab3:
-                # Edit client details
-                with st.form(f"edit_client_{client['id']}"):
-                    edit_name = st.text_input("Company Name", value=client.get("name", ""))
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        edit_contact = st.text_input("Contact Person", value=client.get("contact_name", ""))
-                        edit_email = st.text_input("Email", value=client.get("contact_email", ""))
-                    with col2:
-                        edit_phone = st.text_input("Phone", value=client.get("phone", ""))
-                        edit_status = st.selectbox(
-                            "Status",
-                            ["Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost"],
-                            index=["Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost"].index(client.get("status", "Lead"))
-                        )
-                    edit_notes = st.text_area("Notes", value=client.get("notes", ""))
-
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.form_submit_button("Save Changes", type="primary"):
+        with tab2:
+            # Meeting history, read only while the tab is open
+            if not client.meeting_count:
+                st.info("No meetings recorded yet")
+            elif section_open(tab2):
+                for meeting in get_meetings(client.id):
+                    st.markdown(f"""
+                    <div style="background: #f5f5f5; padding: 0.8rem; border-radius: 8px; margin-bottom: 0.5rem;">
+                        <strong>{format_date(meeting.date)}</strong><br>
+                        <span style="color: #333;">{meeting.summary}</span>
+                        {f"<br><em style='color: #666;'>Next steps: {meeting.next_steps}</em>" if meeting.next_steps else ''}
+                    </div>
+                    """, unsafe_allow_html=True)
+
+            # Add meeting form
+            st.markdown("**Add Meeting**")
+            with st.form(f"meeting_form_{client['id']}"):
+                meeting_date = st.date_input("Date", value=date.today())
+                meeting_summary = st.text_area("Summary")
+                meeting_next = st.text_area("Next Steps")
+
+                if st.form_submit_button("Save Meeting"):
+                    if meeting_summary:
+                        add_meeting_to_client(client["id"], meeting_summary, meeting_date.isoformat(), meeting_next)
+                        st.success("Meeting saved!")
+                        rerun_fragment()
+
+        with tab3:
+            # Edit client details
+            with st.form(f"edit_client_{client['id']}"):
+                edit_name = st.text_input("Company Name", value=client.get("name", ""))
+                col1, col2 = st.columns(2)
+                with col1:
+                    edit_contact = st.text_input("Contact Person", value=client.get("contact_name", ""))
+                    edit_email = st.text_input("Email", value=client.get("contact_email", ""))
+                with col2:
+                    edit_phone = st.text_input("Phone", value=client.get("phone", ""))
+                    edit_status = st.selectbox(
+                        "Status",
+                        ["Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost"],
+                        index=["Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost"].index(client.get("status", "Lead"))
+                    )
+                edit_notes = st.text_area("Notes", value=client.get("notes", ""))
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.form_submit_button("Save Changes", type="primary",
+                                             on_click=remember_client_version,
+                                             args=(client.get("version", 0),)):
+                        try:
                             update_client(client["id"], {
                                 "name": edit_name,
                                 "contact_name": edit_contact,
@@ -693,14 +927,20 @@ def render_clients():
                                 "phone": edit_phone,
                                 "status": edit_status,
                                 "notes": edit_notes
-                            })
+                            }, expected_version=st.session_state.client_edit_version)
+                        except ConflictError:
+                            st.error("Someone else changed this client while you were editing. Save again to overwrite their changes.")
+                        else:
                             st.success("Client updated!")
-                            st.rerun()
-                    with col2:
-                        if st.form_submit_button("Delete Client", type="secondary"):
-                            delete_client(client["id"])
-                            st.rerun()
-
+                            if edit_status in status_filter:
+                                rerun_fragment()
+                            st.rerun()  # The client leaves the filtered list
+                with col2:
+                    if st.form_submit_button("Delete Client", type="secondary"):
+                        delete_client(client["id"])
+                        st.rerun()
+
+@instrument.timed()
 def render_settings():
     """Render settings page"""
     data = load_data()
@@ -709,7 +949,7 @@ def render_settings():
 
     # Display current team
     for partner in data["partners"]:
-        if isinstance(partner, dict):
+        if not isinstance(partner, str):
             st.markdown(f"""
             <div style="background: white; padding: 1rem; border-radius: 8px; margin-bottom: 0.5rem; border-left: 4px solid #2563eb;">
                 <strong>{partner['name']}</strong><br>
@@ -726,29 +966,224 @@ def render_settings():
 
         if st.form_submit_button("Add Member", type="primary"):
             if new_name:
-                data["partners"].append({"name": new_name, "email": new_email})
-                save_data(data)
+                update_partners(data["partners"] + [{"name": new_name, "email": new_email}])
                 st.success(f"Added {new_name}!")
                 st.rerun()
 
+    st.markdown("---")
+    st.subheader("Display")
+
+    st.session_state.page_size = st.selectbox(
+        "Tasks per page",
+        PAGE_SIZES,
+        index=PAGE_SIZES.index(st.session_state.page_size),
+        help="Task List page size and Kanban column window"
+    )
+    st.session_state.lazy_details = st.toggle(
+        "Load task details on demand",
+        value=st.session_state.lazy_details,
+        help="Cards show only their summary until opened, one at a time. Faster on large boards."
+    )
+
     st.markdown("---")
     st.subheader("Data Export")
 
-    if st.button("Export Tasks to CSV"):
-        if data["tasks"]:
-            df = pd.DataFrame(data["tasks"])
-            csv = df.to_csv(index=False)
-            st.download_button(
-                "Download CSV",
-                csv,
-                "climaterix_tasks.csv",
-                "text/csv"
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox("Format", export.formats(), format_func=str.upper)
+    with col2:
+        export_tables = st.multiselect("Tables", list(export.TABLES), default=list(export.TABLES))
+    use_list_filters = st.checkbox(
+        "Apply the Task List filters",
+        help="Export only the tasks (and clients) the Task List currently shows"
+    )
+
+    if st.button("Prepare Export"):
+        filters = {}
+        if use_list_filters and st.session_state.get("list_query"):
+            status, assignee, priority, client, _sort_by = st.session_state.list_query
+            filters = {"status": status, "assignee": assignee, "priority": priority, "client": client}
+        tasks = query_tasks(**filters, sort_by="created")
+        clients = data["clients"]
+        if filters.get("client"):
+            clients = [c for c in clients if c.name in filters["client"]]
+        path = export.export_tables(export_format, tasks, clients, export_tables,
+                                    get_comments=get_comments, get_meetings=get_meetings)
+        # The export is streamed to disk, but Streamlit serves downloads from
+        # memory: the button reads the whole zip and keeps it for the session
+        try:
+            with open(path, "rb") as f:
+                st.download_button(
+                    "Download Export",
+                    f,
+                    f"climetrix_export_{date.today().isoformat()}.zip",
+                    "application/zip"
+                )
+        finally:
+            os.remove(path)
+
+    st.markdown("---")
+    st.subheader("Bulk Import")
+
+    import_kind = st.radio("Import", ["tasks", "clients"], format_func=str.title, horizontal=True)
+    columns = importer.TASK_COLUMNS if import_kind == "tasks" else importer.CLIENT_COLUMNS
+    upload = st.file_uploader(
+        "CSV or JSONL file",
+        type=["csv", "jsonl"],
+        help=f"Columns: {', '.join(columns)}. Assignee, category and client must already exist."
+    )
+    if upload is not None and st.button("Import", type="primary"):
+        progress = st.progress(0.0, text="Importing...")
+        fmt = "jsonl" if upload.name.lower().endswith(".jsonl") else "csv"
+        try:
+            report = importer.import_file(
+                upload, fmt, import_kind,
+                progress=lambda rows: progress.progress(min(upload.tell() / max(upload.size, 1), 1.0),
+                                                        text=f"Importing... {rows} rows read")
             )
+        except importer.ImportFileError as e:
+            progress.empty()
+            st.error(f"Nothing was imported. {e}")
         else:
-            st.info("No tasks to export")
+            progress.empty()
+            st.success(f"Added {report['added']} {import_kind}, skipped {report['skipped']} duplicates")
+            if report["errors"]:
+                st.warning(f"{len(report['errors'])} rows were rejected")
+                st.dataframe(
+                    [{"Row": number, "Error": message} for number, message in report["errors"][:1000]],
+                    hide_index=True, use_container_width=True
+                )
+
+    st.markdown("---")
+    st.subheader("Backups")
+
+    health = backup_status()
+    last_success = health["last_success"].strftime("%b %d, %Y %H:%M:%S") if health["last_success"] else "not yet"
+    schedule = f"every {health['interval'] / 60:g} min and after changes" if health["interval"] else "after changes"
+    st.caption(f"Backups run in the background, {schedule}. Last successful backup: {last_success}. "
+               f"Queued: {health['queue_depth']}. Points taken: {health['points']}, "
+               f"requests coalesced: {health['coalesced']}.")
+    if not health["running"]:
+        st.warning("The backup worker is not running")
+    if health["last_error"] and (health["last_success"] is None or health["last_error_at"] > health["last_success"]):
+        st.error(f"The last backup failed at {health['last_error_at'].strftime('%H:%M:%S')}: {health['last_error']}")
+
+    backups = list_backups()
+    if backups:
+        point = st.selectbox(
+            "Restore point",
+            backups,
+            format_func=lambda p: p["created_at"].strftime("%b %d, %Y %H:%M:%S")
+        )
+        if st.button("Restore Backup", type="secondary"):
+            restore_backup(point["id"])
+            st.success("Backup restored!")
+            st.rerun()
+    else:
+        st.info("No backups yet")
+
+    st.markdown("---")
+    st.subheader("Archive")
+
+    if ARCHIVE_AFTER_DAYS:
+        st.caption(f"Tasks Done for more than {ARCHIVE_AFTER_DAYS} days are archived automatically once a day "
+                   "in the background. Browse, search and restore them from the Task List.")
+    else:
+        st.caption("Automatic archiving is off (CLIMETRIX_ARCHIVE_DAYS=0)")
+    archive_days = st.number_input("Archive tasks Done for more than (days)", min_value=0,
+                                   value=ARCHIVE_AFTER_DAYS or 90, step=1)
+    if st.button("Archive Now"):
+        moved = archive_done_tasks(int(archive_days))
+        st.success(f"Archived {moved} tasks")
+
+    st.markdown("---")
+    st.subheader("Diagnostics")
+
+    collecting = st.toggle(
+        "Collect performance metrics",
+        value=instrument.enabled(),
+        help="Times data operations and page renders for all sessions of this server"
+    )
+    if collecting != instrument.enabled():
+        if collecting:
+            instrument.enable()
+        else:
+            instrument.disable()
+
+    startup = instrument.startup_report()
+    if startup["phases"]:
+        st.caption("Startup of this server: " + ", ".join(
+            f"{phase.replace('_', ' ')} {seconds * 1000:.0f} ms" for phase, seconds in startup["phases"].items()
+        ))
+    if startup["imports"]:
+        st.caption("Loaded on demand: " + ", ".join(
+            f"{module} {seconds * 1000:.0f} ms" for module, seconds in startup["imports"].items()
+        ))
+
+    rows = instrument.summary()
+    timings = [row for row in rows if row["kind"] == "time"]
+    sizes = [row for row in rows if row["kind"] != "time"]
+    if timings:
+        st.caption(f"Wall time in ms. Percentiles over the last {instrument.WINDOW} calls.")
+        st.dataframe([
+            {"Operation": row["name"], "Calls": row["calls"], "Total": round(row["total"] * 1000, 1),
+             "p50": round(row["p50"] * 1000, 2), "p90": round(row["p90"] * 1000, 2),
+             "p99": round(row["p99"] * 1000, 2), "Max": round(row["max"] * 1000, 2)}
+            for row in timings
+        ], hide_index=True, use_container_width=True)
+    if sizes:
+        st.caption("Bytes written, widgets per rerun and store size")
+        st.dataframe([
+            {"Metric": row["name"], "Samples": row["calls"], "Total": row["total"],
+             "p50": row["p50"], "p90": row["p90"], "Max": row["max"]}
+            for row in sizes
+        ], hide_index=True, use_container_width=True)
+    if rows:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download JSON", instrument.snapshot(),
+                               f"climetrix_metrics_{date.today().isoformat()}.json", "application/json")
+        with col2:
+            st.button("Reset Metrics", on_click=instrument.reset)
+    elif instrument.enabled():
+        st.info("No metrics yet. Use the app and come back.")
+    if instrument.log_file():
+        st.caption(f"Metrics are also appended to {instrument.log_file()}")
+
+@instrument.timed()
+def render_search_results(text):
+    """Render tasks and clients matching the sidebar search"""
+    results = search_records(text, limit=50)
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.markdown(f"**{len(results)} results for \"{text}\"**")
+    with col2:
+        st.button("Clear search", on_click=set_state, args=("search_query", ""), use_container_width=True)
+
+    if not results:
+        st.info("Nothing matches your search")
+        return
+
+    for kind, item in results:
+        if kind == "tasks":
+            render_task_card(item)
+        else:
+            task_counts = get_client_task_counts(item.id)
+            st.markdown(f"""
+            <div class="task-card">
+                <strong>🏢 {item.name}</strong> · {item.status}
+                <div style="font-size: 0.85rem; color: #666; margin-top: 5px;">
+                    👤 {item.contact_name or 'N/A'} | 📋 {task_counts['total']} tasks ({task_counts['pending']} pending)
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
 
 # Main app
+@instrument.timed("app.rerun")
 def main():
+    # This run redraws every fragment anyway
+    st.session_state.pop("rerun_app", None)
+
     # Sidebar
     with st.sidebar:
         # Climetrix Logo matching climetrix.io design
@@ -785,6 +1220,9 @@ def main():
 
         st.markdown("---")
 
+        search_text = st.text_input("🔍 Search", key="search_query",
+                                    placeholder="Tasks, comments, clients...")
+
         if st.button("➕ New Task", type="primary", use_container_width=True):
             st.session_state.show_new_task = True
             st.session_state.edit_task_id = None
@@ -794,17 +1232,15 @@ def main():
         render_task_form(default_client=st.session_state.new_task_client)
         st.session_state.new_task_client = None
     elif st.session_state.edit_task_id:
-        task = None
-        data = load_data()
-        for t in data["tasks"]:
-            if t["id"] == st.session_state.edit_task_id:
-                task = t
-                break
+        task = get_task(st.session_state.edit_task_id)
         if task:
             render_task_form(task)
         else:
             st.session_state.edit_task_id = None
             st.rerun()
+    elif search_text.strip():
+        st.markdown('<p class="main-header">Search</p>', unsafe_allow_html=True)
+        render_search_results(search_text.strip())
     elif selected == "Dashboard":
         st.markdown('<p class="main-header">Dashboard</p>', unsafe_allow_html=True)
         render_dashboard()
@@ -821,5 +1257,15 @@ def main():
         st.markdown('<p class="main-header">Settings</p>', unsafe_allow_html=True)
         render_settings()
 
+    if instrument.enabled():
+        widgets = instrument.widgets_this_run()
+        if widgets is not None:
+            instrument.sample("app.widgets", widgets)
+        data = load_data()
+        instrument.sample("data.tasks", len(data["tasks"]))
+        instrument.sample("data.clients", len(data["clients"]))
+        instrument.flush()
+    instrument.note_startup("first_run", time.perf_counter() - _run_started)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,45 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.2
+
+Exits with status 1 when any benchmark's median got slower by more than the
+threshold (a fraction, 0.2 = 20%).
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """(name, baseline median, current median, change) rows for shared benchmarks"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["median"]:
+            continue
+        change = result["median"] / base["median"] - 1
+        rows.append((name, base["median"], result["median"], change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmarks.run outputs")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'benchmark':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base, now, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<20} {base * 1000:>10.2f}ms {now * 1000:>10.2f}ms {change:>+7.1%}{flag}")
+    sys.exit(1 if any(row[4] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Seeded generator of realistic task stores for benchmarks.
+
+The same seed and sizes always give the same document, ids and timestamps
+included, so runs on different machines or commits measure the same data.
+Due dates are spread around `today` so overdue and upcoming counts look
+like a live store; pin it to reproduce a document exactly.
+
+    python -m benchmarks.generate --tasks 5000 --output /tmp/tasks.json
+"""
+import argparse
+import json
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from utils.data_manager import get_default_data
+
+WORDS = (
+    "carbon emissions report scope supplier audit review budget forecast proposal "
+    "meeting follow up contract invoice baseline target reduction energy data "
+    "dashboard verification disclosure framework client workshop training draft "
+    "final update analysis methodology inventory offset certificate renewal"
+).split()
+HEBREW_WORDS = "פגישה לקוח דוח פליטות ספק ביקורת תקציב הצעה חוזה יעד".split()
+FIRST_NAMES = ("Avi", "Sivan", "Lihi", "Noa", "Yoav", "Maya", "Dan", "Tamar", "Omer", "Shira")
+CLIENT_SUFFIXES = ("Ltd", "Group", "Industries", "Energy", "Logistics", "Foods", "Tech")
+
+BASE_TIME = datetime(2025, 1, 1, 9, 0, 0)
+
+
+def _id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    words = [rng.choice(HEBREW_WORDS) if rng.random() < 0.1 else rng.choice(WORDS)
+             for _ in range(rng.randint(low, high))]
+    return " ".join(words)
+
+
+def _stamp(rng: random.Random, days: int = 365) -> str:
+    return (BASE_TIME + timedelta(seconds=rng.randint(0, days * 86400))).isoformat()
+
+
+def generate_store(seed: int = 0, partners: int = 5, clients: int = 100, tasks: int = 2000,
+                   comments_per_task: int = 3, meetings_per_client: int = 4,
+                   today: Optional[date] = None) -> dict:
+    """A document shaped like data/tasks.json, with comments and meetings
+    nested in their records the way Storage.save() accepts them.
+
+    Comment and meeting counts are drawn uniformly up to the given maximum.
+    """
+    rng = random.Random(seed)
+    data = get_default_data()
+    data["partners"] = [
+        {"name": f"{FIRST_NAMES[i % len(FIRST_NAMES)]}{'' if i < len(FIRST_NAMES) else i}",
+         "email": f"partner{i}@example.com"}
+        for i in range(partners)
+    ]
+    partner_names = [p["name"] for p in data["partners"]]
+
+    for i in range(clients):
+        created = _stamp(rng)
+        data["clients"].append({
+            "id": _id(rng),
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(CLIENT_SUFFIXES)} {i}",
+            "contact_name": rng.choice(FIRST_NAMES),
+            "contact_email": f"contact{i}@example.com",
+            "phone": f"+972-5{rng.randint(0, 9)}-{rng.randint(1000000, 9999999)}",
+            "notes": _text(rng, 5, 30),
+            "status": rng.choice(["Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost"]),
+            "meetings": [
+                {"id": _id(rng), "summary": _text(rng, 10, 60), "date": _stamp(rng)[:10],
+                 "next_steps": _text(rng, 3, 15), "created_at": _stamp(rng)}
+                for _ in range(rng.randint(0, meetings_per_client))
+            ],
+            "version": 1,
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    today = today or date.today()
+    for i in range(tasks):
+        created = _stamp(rng)
+        client = rng.choice(data["clients"]) if data["clients"] and rng.random() < 0.6 else None
+        due = today + timedelta(days=rng.randint(-30, 90)) if rng.random() < 0.8 else None
+        data["tasks"].append({
+            "id": _id(rng),
+            "title": _text(rng, 3, 8).capitalize(),
+            "description": _text(rng, 0, 80),
+            "assignee": rng.choice(partner_names) if partner_names else "",
+            "priority": rng.choices(["High", "Medium", "Low"], weights=[2, 5, 3])[0],
+            "status": rng.choices(["To Do", "In Progress", "Done"], weights=[4, 2, 4])[0],
+            "due_date": due.isoformat() if due else None,
+            "category": rng.choice(data["categories"]),
+            "links": [f"https://example.com/doc/{rng.randint(1, 10**6)}" for _ in range(rng.randint(0, 3))],
+            "meeting_summary": _text(rng, 0, 40) if rng.random() < 0.3 else "",
+            "client": client["name"] if client else "",
+            "client_id": client["id"] if client else "",
+            "comments": [
+                {"id": _id(rng), "text": _text(rng, 3, 40), "author": rng.choice(partner_names) if partner_names else "",
+                 "created_at": _stamp(rng)}
+                for _ in range(rng.randint(0, comments_per_task))
+            ],
+            "version": 1,
+            "created_at": created,
+            "updated_at": created,
+        })
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--partners", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=3, help="max comments per task")
+    parser.add_argument("--meetings", type=int, default=4, help="max meetings per client")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+    data = generate_store(args.seed, args.partners, args.clients, args.tasks, args.comments, args.meetings)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Benchmarks for the data layer and the main pages.
+
+Generates a seeded store (benchmarks.generate) in a temporary directory,
+points data_manager at it, then times the store operations and full page
+renders through Streamlit's AppTest. Startup benchmarks render a page in a
+fresh interpreter, so they include importing the app and whatever the page
+loads on demand. Results are written as JSON for benchmarks.compare.
+
+    python -m benchmarks.run --tasks 5000 --output results.json
+    python -m benchmarks.run --backend sqlite --only add_task,render_kanban
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate import generate_store  # noqa: E402
+from utils import backup, data_manager  # noqa: E402
+
+PAGES = ("render_dashboard", "render_kanban", "render_list_view", "render_clients")
+STARTUP = tuple(f"startup_{page}" for page in PAGES)
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def _time(fn, repeat: int, setup=None) -> list:
+    samples = []
+    for _ in range(repeat):
+        if setup is None:
+            start = time.perf_counter()
+            fn()
+        else:
+            argument = setup()
+            start = time.perf_counter()
+            fn(argument)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _use_store(directory: str, backend: str):
+    """Point data_manager at a store in directory and drop cached state"""
+    if data_manager._backup_worker is not None:
+        data_manager._backup_worker.stop()  # Pending points belong to the previous store
+        data_manager._backup_worker = None
+    data_manager.DATA_FILE = os.path.join(directory, "tasks.json")
+    data_manager.LOG_FILE = os.path.join(directory, "tasks.log")
+    data_manager.SQLITE_FILE = os.path.join(directory, "tasks.db")
+    data_manager.BACKUP_DIR = os.path.join(directory, "backups")
+    data_manager.ARCHIVE_DIR = os.path.join(directory, "archive")
+    data_manager.HISTORY_DIR = os.path.join(directory, "history")
+    data_manager.STORAGE_BACKEND = backend
+    # The generated store must not shrink or back itself up on a schedule while it's timed
+    data_manager.ARCHIVE_AFTER_DAYS = 0
+    data_manager.BACKUP_INTERVAL = 0
+    data_manager._storage = None
+    data_manager._shared_store.clear()
+    backup._state.clear()
+
+
+def _cold():
+    data_manager._shared_store.clear()
+
+
+def bench_store(data: dict, repeat: int, rng: random.Random) -> dict:
+    results = {}
+    task_ids = lambda: [t.id for t in data_manager.load_data()["tasks"]]
+
+    results["load_data"] = _time(lambda: (_cold(), data_manager.load_data()), repeat)
+    results["save_data"] = _time(lambda: data_manager.save_data(data_manager.load_data()), repeat)
+
+    results["add_task"] = _time(
+        lambda task: data_manager.add_task(task), repeat,
+        setup=lambda: data_manager.create_task(f"Benchmark task {rng.random()}", assignee="Avi")
+    )
+    results["update_task"] = _time(
+        lambda task_id: data_manager.update_task(task_id, {"status": rng.choice(["To Do", "In Progress", "Done"])}),
+        repeat, setup=lambda: rng.choice(task_ids())
+    )
+    results["add_comment"] = _time(
+        lambda task_id: data_manager.add_comment(task_id, "Benchmark comment", "Avi"),
+        repeat, setup=lambda: rng.choice(task_ids())
+    )
+    results["delete_task"] = _time(
+        lambda task_id: data_manager.delete_task(task_id), repeat, setup=lambda: rng.choice(task_ids())
+    )
+
+    # backup_data only queues a point for the worker, backup_point is the point itself.
+    # Each timed point has one changed task to record.
+    results["backup_data"] = _time(lambda: data_manager.backup_data(), repeat)
+    results["backup_point"] = _time(
+        lambda _: data_manager._take_backup(), repeat,
+        setup=lambda: data_manager.update_task(rng.choice(task_ids()), {"description": str(rng.random())})
+    )
+    return results
+
+
+def bench_pages(pages, repeat: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for page in pages:
+        script = (
+            "import sys\n"
+            f"sys.path.insert(0, {ROOT!r})\n"
+            "import importlib, app\n"
+            "importlib.reload(app)\n"
+            f"app.{page}()\n"
+        )
+        samples = []
+        for _ in range(repeat + 1):
+            at = AppTest.from_string(script, default_timeout=600)
+            start = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+        results[page] = samples[1:]  # the first run also imports the app
+    return results
+
+
+def bench_startup(pages, repeat: int, directory: str, backend: str) -> dict:
+    """Wall time of a fresh interpreter rendering each page once"""
+    results = {}
+    for page in pages:
+        script = f"import sys\nsys.path.insert(0, {ROOT!r})\nimport app\napp.{page}()\n"
+        code = (
+            "import sys\n"
+            f"sys.path.insert(0, {ROOT!r})\n"
+            "from benchmarks.run import _use_store\n"
+            f"_use_store({directory!r}, {backend!r})\n"
+            "from streamlit.testing.v1 import AppTest\n"
+            f"at = AppTest.from_string({script!r}, default_timeout=600)\n"
+            "at.run()\n"
+            "sys.exit(1 if at.exception else 0)\n"
+        )
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            done = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+            samples.append(time.perf_counter() - start)
+            if done.returncode:
+                raise RuntimeError(f"startup of {page} failed: {done.stderr.strip()[-500:]}")
+        results[f"startup_{page}"] = samples
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(seed: int = 0, partners: int = 5, clients: int = 100, tasks: int = 2000,
+        repeat: int = 20, page_repeat: int = 3, backend: str = "json", only=None) -> dict:
+    """Run the benchmarks and return the results document"""
+    data = generate_store(seed, partners, clients, tasks)
+    directory = tempfile.mkdtemp(prefix="climetrix_bench_")
+    try:
+        _use_store(directory, backend)
+        data_manager.get_storage().save(data)
+        rng = random.Random(seed)
+
+        samples = {}
+        if not only or only - set(PAGES) - set(STARTUP):
+            samples.update(bench_store(data, repeat, rng))
+            _use_store(directory, backend)
+        samples.update(bench_pages([p for p in PAGES if not only or p in only], page_repeat))
+        samples.update(bench_startup([p for p in PAGES if not only or f"startup_{p}" in only],
+                                     page_repeat, directory, backend))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "seed": seed,
+            "partners": partners,
+            "clients": clients,
+            "tasks": tasks,
+        },
+        "results": {name: _summary(values) for name, values in samples.items()
+                    if not only or name in only},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time data_manager operations and page renders")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--partners", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20, help="samples per store operation")
+    parser.add_argument("--page-repeat", type=int, default=3, help="samples per page render")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args.seed, args.partners, args.clients, args.tasks, args.repeat,
+                  args.page_repeat, args.backend, set(args.only.split(",")) if args.only else None)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
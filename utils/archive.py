@@ -0,0 +1,164 @@
+"""Cold storage for completed tasks.
+
+Tasks that have been Done for a while leave the working document and are
+kept, comments included, in a directory of gzip-compressed JSON-lines
+segments. Archiving writes a new segment of tasks and a restore writes one
+of removal markers, so neither reads or rewrites what is already archived.
+Segments are written under a temporary name and renamed into place, and
+readers apply them oldest first. Once there are more than COMPACT_SEGMENTS,
+compact() merges them into one.
+
+The archive is only read when someone browses, searches or restores
+history. It is then cached per directory until a write, or a segment
+another process wrote, replaces it. Callers serialize writers
+(data_manager holds the storage lock).
+"""
+import gzip
+import json
+import os
+import threading
+from typing import Iterable, Optional
+
+from utils import instrument, models, search
+
+# Segments allowed to accumulate before compact() merges them
+COMPACT_SEGMENTS = 32
+
+_SUFFIX = ".jsonl.gz"
+
+_lock = threading.Lock()
+_state = {}  # directory -> {"signature", "tasks": {id: Task}, "order": [Task], "index"}
+
+
+def _legacy_file(directory) -> str:
+    """The single file the archive was kept in before segments, read as the oldest one"""
+    return directory + ".json.gz"
+
+
+def _segments(directory) -> list:
+    """Segment paths, oldest first"""
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(_SUFFIX))
+    except FileNotFoundError:
+        names = []
+    paths = [os.path.join(directory, name) for name in names]
+    if os.path.exists(_legacy_file(directory)):
+        paths.insert(0, _legacy_file(directory))
+    return paths
+
+
+def _signature(paths) -> tuple:
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            pass
+    return tuple(stamps)
+
+
+def _completed(task) -> str:
+    return task.completed_at or task.updated_at or ""
+
+
+def _read(paths) -> dict:
+    """{id: Task} after applying the segments in order"""
+    tasks = {}
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            if path.endswith(_SUFFIX):
+                lines = (json.loads(line) for line in f)
+            else:
+                lines = json.load(f).get("tasks", [])
+            for values in lines:
+                if "removed" in values:
+                    tasks.pop(values["removed"], None)
+                else:
+                    task = models.Task.from_dict(values)
+                    tasks.pop(task.id, None)  # A task archived again moves to the end
+                    tasks[task.id] = task
+    return tasks
+
+
+def _get_state(directory) -> dict:
+    paths = _segments(directory)
+    signature = _signature(paths)
+    state = _state.get(directory)
+    if state is None or state["signature"] != signature:
+        state = _state[directory] = {"signature": signature, "tasks": _read(paths), "order": None, "index": None}
+    return state
+
+
+def _write_segment(directory, entries: list):
+    """Write entries as the newest segment and forget the cached archive"""
+    os.makedirs(directory, exist_ok=True)
+    names = [name for name in os.listdir(directory) if name.endswith(_SUFFIX)]
+    number = max((int(name[:-len(_SUFFIX)]) for name in names), default=0) + 1
+    path = os.path.join(directory, f"{number:012d}{_SUFFIX}")
+    payload = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+                      for entry in entries).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+            f.write(payload)
+        raw.flush()
+        os.fsync(raw.fileno())
+        instrument.count("archive.bytes_written", raw.tell())
+    os.replace(tmp_path, path)
+    _state.pop(directory, None)
+
+
+def load(directory) -> list:
+    """Archived tasks, most recently completed first"""
+    with _lock:
+        state = _get_state(directory)
+        if state["order"] is None:
+            state["order"] = sorted(state["tasks"].values(), key=_completed, reverse=True)
+        return state["order"]
+
+
+def get(directory, task_id: str) -> Optional[models.Task]:
+    with _lock:
+        return _get_state(directory)["tasks"].get(task_id)
+
+
+def add(directory, tasks: Iterable):
+    """Add or replace tasks in the archive"""
+    entries = [models.Task.from_dict(task).to_dict() for task in tasks]
+    if entries:
+        with _lock:
+            _write_segment(directory, entries)
+
+
+def remove(directory, task_ids: Iterable[str]):
+    entries = [{"removed": task_id} for task_id in task_ids]
+    if entries:
+        with _lock:
+            _write_segment(directory, entries)
+
+
+def compact(directory) -> bool:
+    """Merge the segments into one once there are more than COMPACT_SEGMENTS. True if merged."""
+    with _lock:
+        paths = _segments(directory)
+        if len(paths) <= COMPACT_SEGMENTS:
+            return False
+        tasks = _read(paths)
+        _write_segment(directory, [task.to_dict() for task in tasks.values()])
+        # Oldest first, so an interrupted compaction never keeps a task without its later removal
+        for path in paths:
+            os.remove(path)
+        return True
+
+
+def search_tasks(directory, text: str, limit: int = 50) -> list:
+    """Archived tasks matching text, best first"""
+    with _lock:
+        state = _get_state(directory)
+        if state["index"] is None:
+            state["index"] = search.SearchIndex()
+            for task in state["tasks"].values():
+                state["index"].index("tasks", task.id, search.task_fields(task, task.get("comments") or ()))
+        tasks = state["tasks"]
+        return [tasks[task_id] for _kind, task_id, _score in state["index"].search(text, limit)]
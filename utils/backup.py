@@ -0,0 +1,444 @@
+"""Incremental, compressed backups of the task store.
+
+Each record (task, client, the partner list, the category list) is stored once
+as a gzipped, content-addressed object. A backup point is a small gzipped
+manifest mapping record keys to object hashes. Most points only hold the keys
+that changed since their parent point; every BACKUP_FULL_EVERY points a full
+manifest is written so restores replay a short chain. Each record's digest is
+cached by its updated_at, and the cache is saved with the points, so unchanged
+records aren't serialized again, not even by a newly started process.
+
+Worker takes points on a background thread, so writes don't wait for them.
+Processes sharing a backup directory take points and prune under a lock
+file in it, and each re-reads the newest point before writing a delta.
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from utils import instrument, storage
+
+BACKUP_FULL_EVERY = 50
+
+# Retention: everything from the last hour, then the newest point per hour,
+# per day and per week inside each window.
+RETENTION = [
+    (timedelta(hours=1), None),
+    (timedelta(days=1), "%Y%m%d%H"),
+    (timedelta(days=7), "%Y%m%d"),
+    (timedelta(weeks=8), "%G%V"),
+]
+PRUNE_INTERVAL = timedelta(hours=1)
+
+_lock = threading.RLock()
+_state = {}
+_file_locks = {}
+
+
+def _objects_dir(backup_dir):
+    return os.path.join(backup_dir, "objects")
+
+
+def _hashes_path(backup_dir):
+    return os.path.join(backup_dir, "hashes.json.gz")
+
+
+def _points_dir(backup_dir):
+    return os.path.join(backup_dir, "points")
+
+
+def _object_path(backup_dir, digest):
+    return os.path.join(_objects_dir(backup_dir), digest[:2], digest + ".json.gz")
+
+
+def _read_gz(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_gz(path, payload: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+        f.write(payload)
+    if instrument.enabled():
+        instrument.count("backup.bytes_written", os.path.getsize(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def _file_lock(backup_dir) -> storage.FileLock:
+    """The lock other processes writing to backup_dir honour too. Callers hold _lock."""
+    lock = _file_locks.get(backup_dir)
+    if lock is None:
+        lock = _file_locks[backup_dir] = storage.FileLock(os.path.join(backup_dir, "lock"))
+    return lock
+
+
+def _stored_objects(backup_dir) -> set:
+    digests = set()
+    objects_dir = _objects_dir(backup_dir)
+    if os.path.isdir(objects_dir):
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name.endswith(".json.gz"):
+                    digests.add(name[:-len(".json.gz")])
+    return digests
+
+
+def _get_state(backup_dir):
+    """Per-directory cache of the newest point and its full manifest. Callers hold the file lock.
+
+    Another process may have written a newer point, or pruned this one's, since
+    the cache was filled; then it is read again from disk.
+    """
+    points = list_points(backup_dir)
+    head = points[-1] if points else None
+    state = _state.get(backup_dir)
+    if state is None:
+        state = _state[backup_dir] = {
+            "hashes": _read_hashes(backup_dir),  # record key -> (updated_at, digest)
+            "hashes_saved": True,
+            "head": None,
+            "manifest": {},
+            "depth": 0,
+            "last_prune": None,
+        }
+    if (head and head["id"]) != (state["head"] and state["head"]["id"]):
+        state["head"] = head
+        state["manifest"] = resolve_manifest(backup_dir, head["id"]) if head else {}
+        state["depth"] = _chain_depth(backup_dir, head["id"]) if head else 0
+    return state
+
+
+def _read_hashes(backup_dir) -> dict:
+    """The digest cache a process saved, so the first point after a start
+    doesn't serialize every record again"""
+    try:
+        return {key: tuple(cached) for key, cached in _read_gz(_hashes_path(backup_dir)).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_keys(data):
+    yield "partners", None, data.get("partners", [])
+    yield "categories", None, data.get("categories", [])
+    for task in data.get("tasks", []):
+        yield "task:" + task["id"], task.get("updated_at"), task
+    for client in data.get("clients", []):
+        yield "client:" + client["id"], client.get("updated_at"), client
+
+
+def _store_record(backup_dir, state, key, stamp, record, expand=None) -> str:
+    cached = state["hashes"].get(key)
+    # Only objects the newest point references are sure to survive another process's prune
+    if stamp is not None and cached is not None and cached == (stamp, state["manifest"].get(key)):
+        return cached[1]
+    if expand is not None and key.startswith(("task:", "client:")):
+        record = expand(record)
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False,
+                         separators=(",", ":"), default=storage._encode).encode("utf-8")
+    digest = hashlib.sha1(payload).hexdigest()
+    if not os.path.exists(_object_path(backup_dir, digest)):
+        _write_gz(_object_path(backup_dir, digest), payload)
+    if stamp is not None:
+        state["hashes"][key] = (stamp, digest)
+        state["hashes_saved"] = False
+    return digest
+
+
+def _read_point(backup_dir, point_id):
+    return _read_gz(os.path.join(_points_dir(backup_dir), point_id + ".json.gz"))
+
+
+def _chain_depth(backup_dir, point_id):
+    depth = 0
+    point = _read_point(backup_dir, point_id)
+    while point.get("parent"):
+        depth += 1
+        point = _read_point(backup_dir, point["parent"])
+    return depth
+
+
+def list_points(backup_dir) -> list:
+    """Backup points, oldest first, as {"id", "created_at"} dicts"""
+    points_dir = _points_dir(backup_dir)
+    if not os.path.isdir(points_dir):
+        return []
+    points = []
+    for name in sorted(os.listdir(points_dir)):
+        if name.endswith(".json.gz"):
+            point_id = name[:-len(".json.gz")]
+            created = datetime.strptime(point_id, "%Y%m%d_%H%M%S_%f")
+            points.append({"id": point_id, "created_at": created})
+    return points
+
+
+def resolve_manifest(backup_dir, point_id) -> dict:
+    """Full key -> object hash mapping for a point, following its delta chain"""
+    chain = []
+    point = _read_point(backup_dir, point_id)
+    chain.append(point)
+    while point.get("parent"):
+        point = _read_point(backup_dir, point["parent"])
+        chain.append(point)
+    manifest = {}
+    for point in reversed(chain):
+        for key, digest in point["records"].items():
+            if digest is None:
+                manifest.pop(key, None)
+            else:
+                manifest[key] = digest
+    return manifest
+
+
+def create_point(backup_dir, data, expand=None) -> Optional[str]:
+    """Write a backup point for data. Returns None when nothing changed.
+
+    expand, when given, maps a task or client to the record to store (with
+    its comments or meetings). It is only called for records that changed.
+    """
+    with _lock, _file_lock(backup_dir):
+        state = _get_state(backup_dir)
+        manifest = {}
+        for key, stamp, record in _record_keys(data):
+            manifest[key] = _store_record(backup_dir, state, key, stamp, record, expand)
+
+        if not state["hashes_saved"]:
+            _write_gz(_hashes_path(backup_dir), json.dumps(state["hashes"], separators=(",", ":")).encode("utf-8"))
+            state["hashes_saved"] = True
+
+        previous = state["manifest"]
+        changes = {k: v for k, v in manifest.items() if previous.get(k) != v}
+        changes.update({k: None for k in previous if k not in manifest})
+        if state["head"] is not None and not changes:
+            return None
+
+        now = datetime.now()
+        point_id = now.strftime("%Y%m%d_%H%M%S_%f")
+        full = state["head"] is None or state["depth"] + 1 >= BACKUP_FULL_EVERY
+        point = {
+            "parent": None if full else state["head"]["id"],
+            "records": manifest if full else changes,
+        }
+        _write_gz(os.path.join(_points_dir(backup_dir), point_id + ".json.gz"),
+                  json.dumps(point, separators=(",", ":")).encode("utf-8"))
+        state["head"] = {"id": point_id, "created_at": now}
+        state["manifest"] = manifest
+        state["depth"] = 0 if full else state["depth"] + 1
+
+        if state["last_prune"] is None or now - state["last_prune"] >= PRUNE_INTERVAL:
+            prune(backup_dir, now)
+        return point_id
+
+
+def _retained(points, now) -> set:
+    keep = set()
+    seen_buckets = set()
+    for point in reversed(points):  # newest first, so each bucket keeps its newest point
+        age = now - point["created_at"]
+        for window, bucket_format in RETENTION:
+            if age > window:
+                continue
+            if bucket_format is None:
+                keep.add(point["id"])
+            else:
+                bucket = (bucket_format, point["created_at"].strftime(bucket_format))
+                if bucket not in seen_buckets:
+                    seen_buckets.add(bucket)
+                    keep.add(point["id"])
+            break
+    if points:
+        keep.add(points[-1]["id"])
+    return keep
+
+
+def prune(backup_dir, now: Optional[datetime] = None):
+    """Apply the retention policy and drop objects no kept point references"""
+    with _lock, _file_lock(backup_dir):
+        state = _get_state(backup_dir)
+        now = now or datetime.now()
+        state["last_prune"] = now
+        points = list_points(backup_dir)
+        keep = _retained(points, now)
+        if len(keep) == len(points):
+            return
+
+        # Rewrite kept points whose delta chain goes through a dropped point
+        manifests = {p["id"]: resolve_manifest(backup_dir, p["id"]) for p in points if p["id"] in keep}
+        previous_kept = None
+        for point in points:
+            if point["id"] not in keep:
+                continue
+            stored = _read_point(backup_dir, point["id"])
+            if stored.get("parent") and stored["parent"] != previous_kept:
+                rewritten = {"parent": None, "records": manifests[point["id"]]}
+                _write_gz(os.path.join(_points_dir(backup_dir), point["id"] + ".json.gz"),
+                          json.dumps(rewritten, separators=(",", ":")).encode("utf-8"))
+            previous_kept = point["id"]
+
+        for point in points:
+            if point["id"] not in keep:
+                os.remove(os.path.join(_points_dir(backup_dir), point["id"] + ".json.gz"))
+
+        referenced = set()
+        for manifest in manifests.values():
+            referenced.update(manifest.values())
+        for digest in _stored_objects(backup_dir) - referenced:
+            try:
+                os.remove(_object_path(backup_dir, digest))
+            except FileNotFoundError:
+                pass
+        state["hashes"] = {k: v for k, v in state["hashes"].items() if v[1] in referenced}
+        state["depth"] = _chain_depth(backup_dir, state["head"]["id"]) if state["head"] else 0
+
+
+def find_point(backup_dir, at: datetime) -> Optional[str]:
+    """Id of the newest point taken at or before the given time"""
+    found = None
+    for point in list_points(backup_dir):
+        if point["created_at"] > at:
+            break
+        found = point["id"]
+    return found
+
+
+def load_point(backup_dir, point_id) -> dict:
+    """Rebuild the full document stored in a backup point"""
+    data = {"partners": [], "tasks": [], "clients": [], "categories": []}
+    with _lock, _file_lock(backup_dir):  # Not pruned while it's read
+        manifest = resolve_manifest(backup_dir, point_id)
+        for key, digest in manifest.items():
+            record = _read_gz(_object_path(backup_dir, digest))
+            if key in ("partners", "categories"):
+                data[key] = record
+            elif key.startswith("task:"):
+                data["tasks"].append(record)
+            elif key.startswith("client:"):
+                data["clients"].append(record)
+    data["tasks"].sort(key=lambda r: r.get("created_at", ""))
+    data["clients"].sort(key=lambda r: r.get("created_at", ""))
+    return data
+
+
+class Worker:
+    """Takes backup points on a background thread.
+
+    request() returns at once. A point is taken from the live store once the
+    worker gets to it, so a queued request covers every write made before
+    then: requests arriving within `delay` seconds of each other, or while
+    the bounded queue is full, are coalesced into one point. A point is also
+    taken every `interval` seconds (0 turns the schedule off); an unchanged
+    store writes nothing. take() returns the new point id or None.
+    """
+
+    def __init__(self, take: Callable[[], Optional[str]], interval: float = 300.0,
+                 queue_size: int = 8, delay: float = 0.5):
+        self.interval = interval
+        self.delay = delay
+        self._take = take
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._health = {
+            "last_success": None,  # datetime of the last point attempt that didn't fail
+            "last_point": None,  # id of the last point written
+            "last_error": None,
+            "last_error_at": None,
+            "points": 0,
+            "coalesced": 0,  # requests folded into another one's point
+        }
+
+    def start(self):
+        """Start the thread if it isn't running. Its first action is a point of the current state."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="backup-worker", daemon=True)
+                self._thread.start()
+
+    def request(self):
+        """Ask for a point of the store as it is now or later"""
+        self.start()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            with self._lock:
+                self._health["coalesced"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ask for a point and wait until it's taken. False on timeout."""
+        self.start()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10.0):
+        """Take a last point if any are queued, then end the thread"""
+        with self._lock:
+            thread, self._stopping = self._thread, True
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass  # The worker is busy with a queue that covers us
+            thread.join(timeout)
+
+    def status(self) -> dict:
+        """Health: last success and error, points taken, requests coalesced, queue depth"""
+        with self._lock:
+            status = dict(self._health)
+        status["queue_depth"] = self._queue.qsize()
+        status["running"] = self._thread is not None and self._thread.is_alive()
+        status["interval"] = self.interval
+        return status
+
+    def _drain(self) -> list:
+        requests = []
+        while True:
+            try:
+                requests.append(self._queue.get_nowait())
+            except queue.Empty:
+                return requests
+
+    def _run(self):
+        requests = []
+        while True:
+            self._point(requests)
+            if self._stopping and self._queue.empty():
+                return
+            try:
+                requests = [self._queue.get(timeout=self.interval or None)]
+            except queue.Empty:
+                requests = []  # Scheduled point
+                continue
+            if self.delay and not self._stopping:
+                time.sleep(self.delay)  # Let a burst of writes finish
+            requests += self._drain()
+
+    def _point(self, requests: list):
+        try:
+            point_id = self._take()
+        except Exception as e:
+            with self._lock:
+                self._health["last_error"] = f"{type(e).__name__}: {e}"
+                self._health["last_error_at"] = datetime.now()
+        else:
+            with self._lock:
+                self._health["last_success"] = datetime.now()
+                if point_id is not None:
+                    self._health["last_point"] = point_id
+                    self._health["points"] += 1
+                self._health["coalesced"] += max(0, len(requests) - 1)
+        for request in requests:
+            if request is not None:
+                request.set()
@@ -1,13 +1,56 @@
-import json
+import atexit
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional
 import uuid
-import shutil
 import streamlit as st
+from utils import archive, backup, instrument, models, persistent, search, storage
+from utils.helpers import date_ordinal, parse_date, today_ordinal
 
 DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tasks.json")
+LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tasks.log")
+SQLITE_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tasks.db")
 BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "backups")
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "archive")
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "history")
+
+# "json" (snapshot + mutation log) or "sqlite"
+STORAGE_BACKEND = os.environ.get("CLIMETRIX_STORAGE", "json")
+
+# Seconds between checks of the storage for writes made by other processes
+FRESHNESS_INTERVAL = 1.0
+
+# Done tasks older than this many days move to the archive, checked once a day
+# by the backup worker.
+# 0 turns the automatic pass off; archive_done_tasks() can still be run by hand.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("CLIMETRIX_ARCHIVE_DAYS", "90"))
+
+# Task changes remembered for consumers that patch derived views (utils.query)
+CHANGE_FEED_SIZE = 1000
+
+# Backup points are taken by a background worker after writes, coalescing
+# writes less than BACKUP_DELAY seconds apart, and every BACKUP_INTERVAL seconds
+# (0 turns the schedule off). Requests beyond BACKUP_QUEUE_SIZE waiting ones
+# fold into those.
+BACKUP_INTERVAL = float(os.environ.get("CLIMETRIX_BACKUP_INTERVAL", "300"))
+BACKUP_DELAY = 0.5
+BACKUP_QUEUE_SIZE = 8
+
+_storage = None
+_storage_lock = threading.Lock()
+
+_backup_worker = None
+_backup_worker_lock = threading.Lock()
+
+# The draft (see _fork) of the transaction open on the current thread, if any
+_transaction = threading.local()
+
+class ConflictError(Exception):
+    """A conditional update found the record changed (or deleted) since it was read"""
 
 def get_default_data():
     return {
@@ -21,54 +64,590 @@ def get_default_data():
         "categories": ["Development", "Marketing", "Operations", "Finance", "Legal", "General"]
     }
 
+def get_storage() -> storage.Storage:
+    """The configured storage backend, created once per process"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            json_storage = storage.JsonLogStorage(DATA_FILE, LOG_FILE, HISTORY_DIR, _replay, get_default_data)
+            if STORAGE_BACKEND == "sqlite":
+                sqlite_storage = storage.SqliteStorage(SQLITE_FILE)
+                if sqlite_storage.is_empty():
+                    # First run on SQLite: import the existing JSON store
+                    data = json_storage.load()
+                    sqlite_storage.save(data, {kind: dict(json_storage.history_items(kind))
+                                               for kind in storage.HISTORY_OPS})
+                _storage = sqlite_storage
+            else:
+                _storage = json_storage
+    return _storage
+
+@st.cache_resource(show_spinner=False)
+def _shared_store() -> dict:
+    """One in-memory copy of the store per process, shared by every session"""
+    return {
+        "current": None,  # the published snapshot (see _snapshot), replaced whole on every change
+        "signature": None,
+        "checked_at": 0.0,
+        "lock": threading.RLock(),
+        "query": None,  # query.TaskQueryEngine, created by the first in-memory query
+        "archived_on": None,  # date ordinal of the last automatic archive pass
+        "search_lock": threading.Lock(),  # held by the thread building the search index
+        "search_pending": None,  # records published while it's built, see _search_index
+    }
+
+def _snapshot(data: dict, index: dict, version: int, changes=(), changes_from: Optional[int] = None,
+              listed: Optional[int] = None) -> dict:
+    """One version of the document and its index.
+
+    Nothing in a published snapshot changes: writers apply records to a fork
+    of it (see _fork) and publish that, so readers need no lock and never
+    see a change half applied. The document's task and client lists are
+    the exception, they're built from the index on first use (see _document).
+    """
+    return {
+        "data": data,
+        "index": index,
+        "version": version,
+        "listed": version if listed is None else listed,  # the version data's lists were built at
+        # (version, task id) of recent task changes, complete for versions after changes_from
+        "changes": tuple(changes),
+        "changes_from": version if changes_from is None else changes_from,
+    }
+
+def _storage_signature():
+    try:
+        return get_storage().signature()
+    except Exception:
+        return None
+
+def _install(store: dict, data: dict):
+    current = store["current"]
+    data = models.load_document(data)
+    store["current"] = _snapshot(data, _build_index(data), (current["version"] if current else 0) + 1)
+    store["signature"] = _storage_signature()
+    store["search_pending"] = None  # A search index being built is for the replaced document
+
+def _note_change(draft: dict, record: dict):
+    """Bump the draft's version and add the task the record touched to its change feed"""
+    draft["version"] += 1
+    op = record["op"]
+    if op == "task.add":
+        task_id = record["task"]["id"]
+    elif op in ("task.update", "task.delete"):
+        task_id = record["id"]
+    else:
+        return
+    changes = draft["changes"]
+    if len(changes) == changes.maxlen:
+        draft["changes_from"] = changes[0][0]
+    changes.append((draft["version"], task_id))
+
+@instrument.timed()
+def _catch_up(store: dict):
+    """Bring the shared document up to date with writes from other processes.
+    Callers hold the store lock and the storage lock."""
+    current = store["current"]
+    if current is not None and _storage_signature() == store["signature"]:
+        return
+    records = None
+    if current is not None:
+        records = get_storage().changes_since(store["signature"])
+    if records is None:
+        data = get_storage().load()
+        if _migrate_client_ids(data):
+            try:
+                get_storage().save(data)
+            except Exception:
+                pass  # On read-only filesystem, data stays in memory
+        _install(store, data)
+        return
+    draft = _fork(current)
+    for record in records:
+        _apply(draft["data"], draft["index"], record)
+        _note_change(draft, record)
+        draft["records"].append(record)
+    store["signature"] = _storage_signature()
+    _publish(store, draft)
+
+def _store() -> dict:
+    store = _shared_store()
+    if store["current"] is None:
+        with store["lock"]:
+            if store["current"] is None:
+                store["checked_at"] = time.monotonic()
+                with get_storage().lock:
+                    _catch_up(store)
+                # The worker's first point records the store as it was before this process wrote
+                _get_backup_worker().start()
+    elif time.monotonic() - store["checked_at"] >= FRESHNESS_INTERVAL:
+        # A writer holding the lock catches up itself, readers don't wait for it
+        if store["lock"].acquire(blocking=False):
+            try:
+                store["checked_at"] = time.monotonic()
+                if _storage_signature() != store["signature"]:
+                    with get_storage().lock:
+                        _catch_up(store)
+            finally:
+                store["lock"].release()
+    return store
+
+def _view() -> dict:
+    """The snapshot the current thread reads: its open transaction's draft, else the published one"""
+    draft = getattr(_transaction, "draft", None)
+    return _store()["current"] if draft is None else draft
+
+def _document(view: dict) -> dict:
+    """A snapshot's (or draft's) document, its task and client lists rebuilt
+    from the index the first time they're read after a change"""
+    if view["listed"] != view["version"]:
+        _list_items(view["data"], view["index"])
+        view["listed"] = view["version"]
+    return view["data"]
+
+@instrument.timed()
 def load_data():
-    # Use session state to cache data during the session
-    if "app_data" in st.session_state:
-        return st.session_state.app_data
+    """The current snapshot of the document, shared by every session.
+    It never changes once returned; mutate through the functions below."""
+    return _document(_view())
+
+def get_data_version() -> int:
+    """Increases on every change to the shared document"""
+    return _view()["version"]
+
+def _get_index() -> dict:
+    return _view()["index"]
+
+@instrument.timed()
+def save_data(data):
+    """Persist the whole document, replacing what the backend holds.
+    Comments and meetings nested in its records replace the stored ones."""
+    store = _shared_store()
+    _migrate_client_ids(data)
+    with store["lock"], get_storage().lock:
+        # Try to save to file (works locally, may fail on cloud)
+        try:
+            get_storage().save(data)
+        except Exception:
+            pass  # On read-only filesystem, data stays in memory
+        _install(store, data)
 
-    # Try to load from file
-    if os.path.exists(DATA_FILE):
+@instrument.timed()
+def compact():
+    """Fold accumulated mutation records into the backend's base storage"""
+    store = _shared_store()
+    with store["lock"], get_storage().lock:
+        _catch_up(store)
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                st.session_state.app_data = data
-                return data
-        except (json.JSONDecodeError, FileNotFoundError):
+            get_storage().compact()
+        except Exception:
             pass
+        store["signature"] = _storage_signature()
 
-    # Return default data
-    data = get_default_data()
-    st.session_state.app_data = data
-    return data
+def _commit(record: dict, versioned: Optional[tuple] = None):
+    """Apply a mutation record, persist it and publish the result.
 
-def save_data(data):
-    # Always update session state
-    st.session_state.app_data = data
+    versioned is (kind, id, expected_version): the record is stamped with the
+    item's next version, and when expected_version is not None the write only
+    goes through if the item is still at that version.
+    """
+    store = _shared_store()
+    with store["lock"], get_storage().lock:
+        _catch_up(store)
+        draft = getattr(_transaction, "draft", None)
+        in_transaction = draft is not None
+        if not in_transaction:
+            draft = _fork(store["current"])
+        if versioned is not None:
+            kind, item_id, expected_version = versioned
+            item = _lookup(draft["index"], kind, item_id)
+            current_version = None if item is None else item.get("version", 0)
+            if expected_version is not None and current_version != expected_version:
+                if item is None:
+                    raise ConflictError(f"{item_id} was deleted")
+                raise ConflictError(f"{item_id} is at version {current_version}, expected {expected_version}")
+            if item is not None:
+                record["version"] = current_version + 1
+        _apply(draft["data"], draft["index"], record)
+        _note_change(draft, record)
+        draft["records"].append(record)
+        if in_transaction:
+            return
+        try:
+            get_storage().append(record, lambda: _document(draft))
+        except Exception:
+            pass  # On read-only filesystem, data stays in memory
+        store["signature"] = _storage_signature()
+        _publish(store, draft)
+    backup_data()
 
-    # Try to save to file (works locally, may fail on cloud)
-    try:
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
-    except Exception:
-        pass  # On read-only filesystem, data stays in session state
+def _in_transaction() -> bool:
+    return getattr(_transaction, "draft", None) is not None
 
-def backup_data():
-    if not os.path.exists(DATA_FILE):
+def _fork(snapshot: dict) -> dict:
+    """A private, changeable copy of a snapshot for a write or transaction.
+
+    The index's containers are forked (see utils.persistent), which copies
+    only what changed lately, and records are not copied: _apply swaps a
+    task or client it changes for a copy, and _track a client's task sets,
+    so the snapshot's stay as its readers see them.
+    """
+    index, stats = snapshot["index"], snapshot["index"]["stats"]
+    return {
+        "data": dict(snapshot["data"]),
+        "index": {
+            "tasks": index["tasks"].fork(),
+            "clients": index["clients"].fork(),
+            "stats": dict({name: stats[name].fork() for name in _STATS}, copied=set()),
+            "search": index["search"],  # Brought up to date when the draft is published
+        },
+        "version": snapshot["version"],
+        "listed": snapshot["listed"],
+        "changes": deque(snapshot["changes"], maxlen=CHANGE_FEED_SIZE),
+        "changes_from": snapshot["changes_from"],
+        "records": [],  # applied to the draft, not yet published
+    }
+
+def _publish(store: dict, draft: dict):
+    """Make a draft the current snapshot. Callers hold the store lock."""
+    store["current"] = _snapshot(draft["data"], draft["index"], draft["version"],
+                                 draft["changes"], draft["changes_from"], draft["listed"])
+    if store["search_pending"] is not None:
+        store["search_pending"].extend(draft["records"])
+    _update_search(store["current"], draft["records"])
+
+@contextmanager
+def transaction():
+    """Group mutations into one durable write and one backup request.
+
+    Mutations apply to a private copy of the document, which the block's own
+    reads see. When the block exits they are persisted together and the copy
+    is published; if it raises, the copy is dropped and nothing is written.
+    Other writers wait until the block ends; nested transactions join the
+    outer one.
+    """
+    if _in_transaction():
+        yield
+        return
+
+    store = _shared_store()
+    with store["lock"], get_storage().lock:
+        _catch_up(store)
+        _transaction.draft = _fork(store["current"])
+        try:
+            yield
+        finally:
+            draft, _transaction.draft = _transaction.draft, None
+        if draft["records"]:
+            try:
+                get_storage().append_many(draft["records"], lambda: _document(draft))
+            except Exception:
+                pass  # On read-only filesystem, data stays in memory
+            store["signature"] = _storage_signature()
+            _publish(store, draft)
+    if draft["records"]:
+        backup_data()
+
+def _migrate_client_ids(data: dict) -> bool:
+    """Link tasks that only name their client to the client's id. True if any changed."""
+    ids_by_name = {}
+    for client in data.get("clients", []):
+        ids_by_name.setdefault(client.get("name"), client["id"])
+    changed = False
+    for task in data.get("tasks", []):
+        client_id = ids_by_name.get(task.get("client") or None)
+        if client_id and not task.get("client_id"):
+            task["client_id"] = client_id
+            changed = True
+    return changed
+
+# Task stats in the index, each a persistent.Map except "due"
+_STATS = ("status", "assignee", "category", "client", "due", "client_tasks")
+
+def _build_index(data: dict) -> dict:
+    """id -> record for tasks and clients, in the document's order, plus the task stats"""
+    index = {
+        "tasks": persistent.Map((t["id"], t) for t in data["tasks"]),
+        "clients": persistent.Map((c["id"], c) for c in data["clients"]),
+        "stats": {
+            "status": persistent.Map(),
+            "assignee": persistent.Map(),
+            "category": persistent.Map(),
+            "client": persistent.Map(),
+            "due": persistent.SortedList(),  # (due ordinal, task id) of open tasks
+            "client_tasks": persistent.Map(),  # client id -> {"open": task ids, "done": task ids}
+            "copied": set(),  # ids of the clients whose task sets only this index holds
+        },
+        "search": None,  # search.SearchIndex, built on the first search
+    }
+    for task in data["tasks"]:
+        _normalize_due_date(task)
+        _track(index["stats"], task, 1)
+    return index
+
+def _normalize_due_date(task: models.Task):
+    """Store due_date as YYYY-MM-DD (None when invalid) with its ordinal in due_ordinal"""
+    due = parse_date(task.due_date)
+    task.due_date = due.isoformat() if due else None
+    task.due_ordinal = due.toordinal() if due else None
+
+def _stat_due_date(task: models.Task) -> Optional[int]:
+    if task.status == "Done":
+        return None
+    return task.due_ordinal
+
+def _track(stats: dict, task: models.Task, delta: int):
+    """Add (delta=1) or remove (delta=-1) a task's contribution to the stats"""
+    for field, key in (("status", task.status),
+                       ("assignee", task.assignee or "Unassigned"),
+                       ("category", task.category),
+                       ("client", task.client or "")):
+        counts = stats[field]
+        count = counts.get(key, 0) + delta
+        if count:
+            counts[key] = count
+        else:
+            del counts[key]
+
+    client_id = task.client_id
+    if client_id:
+        bucket = "done" if task.status == "Done" else "open"
+        linked = stats["client_tasks"].get(client_id)
+        if client_id not in stats["copied"]:
+            # The sets may be a published snapshot's too
+            linked = {"open": set(linked["open"] if linked else ()), "done": set(linked["done"] if linked else ())}
+            stats["client_tasks"][client_id] = linked
+            stats["copied"].add(client_id)
+        if delta > 0:
+            linked[bucket].add(task.id)
+        else:
+            linked[bucket].discard(task.id)
+            if not linked["open"] and not linked["done"]:
+                del stats["client_tasks"][client_id]
+                stats["copied"].discard(client_id)
+
+    due = _stat_due_date(task)
+    if due is not None:
+        if delta > 0:
+            stats["due"].add((due, task.id))
+        else:
+            stats["due"].discard((due, task.id))
+
+def _lookup(index: dict, kind: str, item_id: str) -> Optional[dict]:
+    return index[kind].get(item_id)
+
+def _list_items(data: dict, index: dict):
+    """Rebuild the document's task and client lists from the index. Dicts keep
+    insertion order, so the lists keep the order records were added in."""
+    data["tasks"] = list(index["tasks"].values())
+    data["clients"] = list(index["clients"].values())
+
+def _replace(index: dict, kind: str, item_id: str) -> Optional[models.Record]:
+    """The item, swapped for a copy that can be changed without touching the
+    one a published snapshot holds"""
+    item = index[kind].get(item_id)
+    if item is None:
+        return None
+    item = index[kind][item_id] = item.copy()
+    return item
+
+def _insert(index: dict, kind: str, item: models.Record):
+    existing = index[kind].get(item.id)
+    if existing is None:
+        index[kind][item.id] = item
+    else:
+        if kind == "tasks":
+            _track(index["stats"], existing, -1)
+        merged = index[kind][item.id] = existing.copy()
+        merged.update(item)
+        item = merged
+    if kind == "tasks":
+        _normalize_due_date(item)
+        _track(index["stats"], item, 1)
+
+def _remove(index: dict, kind: str, item_id: str):
+    item = index[kind].pop(item_id, None)
+    if item is not None and kind == "tasks":
+        _track(index["stats"], item, -1)
+
+def _is_new(item: models.Record, record: dict) -> bool:
+    """False when a replayed record already counted in the item's history summary.
+    Records adding history entries are always stamped with the item's next version."""
+    return "version" not in record or record["version"] > item.version
+
+def _stamp_version(item: models.Record, record: dict):
+    if "version" in record:
+        item.version = record["version"]
+
+def _replay(data: dict, records):
+    index = _build_index(models.load_document(data))
+    for record in records:
+        _apply(data, index, record)
+    _list_items(data, index)
+
+def _apply(data: dict, index: dict, record: dict):
+    """Apply one mutation record. Must stay idempotent, replay may repeat records."""
+    op = record["op"]
+    if op == "task.add":
+        task = models.Task.from_dict(record["task"])
+        models.Task.split_history(task)  # The storage keeps any comments the record brings
+        _insert(index, "tasks", task)
+    elif op == "task.update":
+        task = _replace(index, "tasks", record["id"])
+        if task is not None:
+            _track(index["stats"], task, -1)
+            task.update(record["updates"])
+            if "due_date" in record["updates"]:
+                _normalize_due_date(task)
+            _stamp_version(task, record)
+            _track(index["stats"], task, 1)
+    elif op == "task.delete":
+        _remove(index, "tasks", record["id"])
+    elif op == "comment.add":
+        task = _lookup(index, "tasks", record["task_id"])
+        if task is not None and _is_new(task, record):
+            task = _replace(index, "tasks", task.id)
+            task.comment_count += 1
+            task.last_comment_at = task.updated_at = record["comment"]["created_at"]
+            _stamp_version(task, record)
+    elif op == "partners.set":
+        data["partners"] = [p if isinstance(p, str) else models.Partner.from_dict(p)
+                            for p in record["partners"]]
+    elif op == "client.add":
+        client = models.Client.from_dict(record["client"])
+        models.Client.split_history(client)
+        _insert(index, "clients", client)
+    elif op == "client.update":
+        client = _replace(index, "clients", record["id"])
+        if client is not None:
+            client.update(record["updates"])
+            _stamp_version(client, record)
+    elif op == "client.delete":
+        _remove(index, "clients", record["id"])
+    elif op == "meeting.add":
+        client = _lookup(index, "clients", record["client_id"])
+        if client is not None and _is_new(client, record):
+            client = _replace(index, "clients", client.id)
+            client.meeting_count += 1
+            client.last_meeting_at = client.updated_at = record["meeting"]["created_at"]
+            _stamp_version(client, record)
+
+# Search documents per kind: (history kind, item fields, history entry fields)
+_SEARCH_FIELDS = {
+    "tasks": ("comments", search.task_fields, search.comment_fields),
+    "clients": ("meetings", search.client_fields, search.meeting_fields),
+}
+
+def _touched(records: list) -> tuple:
+    """(kind, id) keys of the tasks and clients records changed, those of them a
+    record deleted, and the (history kind, owner id, entries) records added"""
+    touched, deleted, added = {}, set(), []
+    for record in records:
+        op = record["op"]
+        if op == "task.add":
+            touched[("tasks", record["task"]["id"])] = None
+        elif op == "client.add":
+            touched[("clients", record["client"]["id"])] = None
+        elif op in ("task.update", "task.delete", "client.update", "client.delete"):
+            key = ("tasks" if op.startswith("task.") else "clients", record["id"])
+            touched[key] = None
+            if op.endswith(".delete"):
+                deleted.add(key)
+        entries, _deleted = storage.history_changes(record)
+        if entries is not None:
+            added.append(entries)
+    return touched, deleted, added
+
+def _reindex(index: dict, kind: str, item_id: str, with_history: bool):
+    history_kind, fields, history_fields = _SEARCH_FIELDS[kind]
+    item = _lookup(index, kind, item_id)
+    if item is None:
+        index["search"].remove(kind, item_id)
+    elif with_history:
+        index["search"].index(kind, item_id, fields(item), history_fields(_history(history_kind, item_id)))
+    else:
+        index["search"].index(kind, item_id, fields(item))
+
+def _update_search(snapshot: dict, records: list):
+    """Re-index the tasks and clients published mutation records touched.
+
+    New comments and meetings are indexed from the records adding them, so
+    histories are only read back for items a record deleted (and re-added).
+    """
+    index = snapshot["index"]
+    if index["search"] is None:
         return
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = os.path.join(BACKUP_DIR, f"tasks_backup_{timestamp}.json")
-    shutil.copy2(DATA_FILE, backup_file)
-    # Keep only last 10 backups
-    backups = sorted([f for f in os.listdir(BACKUP_DIR) if f.endswith('.json')])
-    for old_backup in backups[:-10]:
-        os.remove(os.path.join(BACKUP_DIR, old_backup))
+    touched, deleted, added = _touched(records)
+    for kind, item_id in touched:
+        _reindex(index, kind, item_id, (kind, item_id) in deleted)
+    for history_kind, owner_id, entries in added:
+        kind = "tasks" if history_kind == "comments" else "clients"
+        if (kind, owner_id) not in deleted:
+            index["search"].add_history(kind, owner_id, _SEARCH_FIELDS[kind][2](entries))
+
+@instrument.timed()
+def _take_backup() -> Optional[str]:
+    """Write an incremental backup point of the current store. Returns its id, None if unchanged.
+
+    The point is built from the published snapshot, which never changes, so
+    writers don't wait for it. Only records changed since the last point are
+    serialized.
+    """
+    return backup.create_point(BACKUP_DIR, _document(_store()["current"]), expand=_backed_up)
+
+def _backed_up(item: models.Record) -> dict:
+    """_with_history() for a backup point: only the history entries the snapshot's
+    record counts, those written since it was published go in the next point"""
+    kind, count = item._history[:2]
+    return dict(item.to_dict(), **{kind: get_storage().history(kind, item.id)[:getattr(item, count)]})
+
+def _background_job() -> Optional[str]:
+    """The backup worker's job: a backup point, then the daily archive pass. Returns the point id."""
+    point_id = _take_backup()
+    archive_if_due()
+    return point_id
+
+def _get_backup_worker() -> backup.Worker:
+    """The backup worker, created once per process. It takes a last point when the process exits."""
+    global _backup_worker
+    with _backup_worker_lock:
+        if _backup_worker is None:
+            _backup_worker = backup.Worker(_background_job, BACKUP_INTERVAL, BACKUP_QUEUE_SIZE, BACKUP_DELAY)
+            atexit.register(_backup_worker.stop)
+    return _backup_worker
+
+def backup_data():
+    """Ask for a backup point of the current store. Returns at once, the worker takes it."""
+    if _in_transaction():
+        return  # Requested once when the transaction commits
+    _get_backup_worker().request()
+
+def flush_backups(timeout: Optional[float] = None) -> bool:
+    """Take a backup point now and wait for it. False on timeout."""
+    return _get_backup_worker().flush(timeout)
+
+def backup_status() -> dict:
+    """Health of the backup worker: last success and error, queue depth, points taken"""
+    return _get_backup_worker().status()
+
+def list_backups() -> list:
+    """Available backup points, newest first"""
+    return list(reversed(backup.list_points(BACKUP_DIR)))
+
+@instrument.timed()
+def restore_backup(point_id: str):
+    """Replace the store with the contents of a backup point"""
+    try:
+        _take_backup()  # Now, not in the background: the current state is about to be replaced
+    except OSError:
+        pass  # On read-only filesystem, skip backups
+    save_data(backup.load_point(BACKUP_DIR, point_id))
+    backup_data()
 
 def create_task(title: str, description: str = "", assignee: str = "",
                 priority: str = "Medium", due_date: Optional[str] = None,
                 category: str = "General", links: list = None,
-                meeting_summary: str = "", client: str = "") -> dict:
+                meeting_summary: str = "", client: str = "", client_id: str = "") -> dict:
     return {
         "id": str(uuid.uuid4()),
         "title": title,
@@ -81,69 +660,146 @@ def create_task(title: str, description: str = "", assignee: str = "",
         "links": links or [],
         "meeting_summary": meeting_summary,
         "client": client,
-        "comments": [],
+        "client_id": client_id,
+        "version": 1,
         "created_at": datetime.now().isoformat(),
         "updated_at": datetime.now().isoformat()
     }
 
+def _client_id(name: str) -> str:
+    """Id of the first client with this name, "" if there is none"""
+    if not name:
+        return ""
+    return next((c.id for c in _get_index()["clients"].values() if c.name == name), "")
+
+@instrument.timed()
 def add_task(task: dict):
-    data = load_data()
-    data["tasks"].append(task)
-    backup_data()
-    save_data(data)
+    if task.get("client") and not task.get("client_id"):
+        task["client_id"] = _client_id(task["client"])  # Linked now, not on the next reload
+    _commit({"op": "task.add", "task": task})
     return task
 
-def update_task(task_id: str, updates: dict):
-    data = load_data()
-    for i, task in enumerate(data["tasks"]):
-        if task["id"] == task_id:
-            data["tasks"][i].update(updates)
-            data["tasks"][i]["updated_at"] = datetime.now().isoformat()
-            break
-    backup_data()
-    save_data(data)
+@instrument.timed()
+def update_task(task_id: str, updates: dict, expected_version: Optional[int] = None):
+    """Update a task. With expected_version, raise ConflictError if it changed meanwhile."""
+    updates = dict(updates, updated_at=datetime.now().isoformat())
+    if "client" in updates and "client_id" not in updates:
+        updates["client_id"] = _client_id(updates["client"])
+    if "status" in updates:
+        task = get_task(task_id)
+        if task is not None and (task.status == "Done") != (updates["status"] == "Done"):
+            updates["completed_at"] = updates["updated_at"] if updates["status"] == "Done" else None
+    _commit({"op": "task.update", "id": task_id, "updates": updates},
+            versioned=("tasks", task_id, expected_version))
 
+@instrument.timed()
 def delete_task(task_id: str):
-    data = load_data()
-    data["tasks"] = [t for t in data["tasks"] if t["id"] != task_id]
-    backup_data()
-    save_data(data)
+    _commit({"op": "task.delete", "id": task_id})
 
+@instrument.timed()
 def get_task(task_id: str) -> Optional[dict]:
-    data = load_data()
-    for task in data["tasks"]:
-        if task["id"] == task_id:
-            return task
-    return None
+    return _lookup(_get_index(), "tasks", task_id)
 
-def add_comment(task_id: str, comment: str, author: str):
-    data = load_data()
-    for task in data["tasks"]:
-        if task["id"] == task_id:
-            task["comments"].append({
-                "id": str(uuid.uuid4()),
-                "text": comment,
-                "author": author,
-                "created_at": datetime.now().isoformat()
-            })
-            task["updated_at"] = datetime.now().isoformat()
-            break
-    save_data(data)
+@instrument.timed()
+def query_tasks(status: list = None, assignee: list = None, priority: list = None,
+                category: list = None, client: list = None, sort_by: Optional[str] = None) -> list:
+    """Tasks matching every non-empty filter (a list of allowed values), sorted by sort_by"""
+    view = _view()
+    index = view["index"]
+    filters = {"status": status, "assignee": assignee, "priority": priority,
+               "category": category, "client": client}
+
+    # Inside a transaction neither the storage nor the shared engine has its changes yet
+    in_transaction = _in_transaction()
+    ids = None if in_transaction else get_storage().query_task_ids(filters, sort_by)
+    if ids is None:
+        store = _shared_store()
+        engine = None if in_transaction else store["query"]
+        if engine is None:
+            # Imported here so pages that never query, and the SQLite backend, don't load pandas
+            engine = instrument.import_module("utils.query").TaskQueryEngine()
+            if not in_transaction:
+                store["query"] = engine
+        ids = engine.query(
+            view["version"], index["tasks"].values(), lambda task_id: _lookup(index, "tasks", task_id),
+            tuple(view["changes"]), view["changes_from"], filters, sort_by
+        )
+    return [t for t in (_lookup(index, "tasks", task_id) for task_id in ids) if t is not None]
+
+@instrument.timed()
+def get_task_stats() -> dict:
+    """Task counts by status, assignee, category and client, kept current by every mutation"""
+    view = _view()
+    stats = view["index"]["stats"]
+    return {
+        "total": len(view["index"]["tasks"]),
+        "status": dict(stats["status"]),
+        "assignee": dict(stats["assignee"]),
+        "category": dict(stats["category"]),
+        "client": dict(stats["client"]),
+    }
 
+@instrument.timed()
+def count_overdue_tasks(today: Optional[int] = None) -> int:
+    """Open tasks whose due date is before today (a date ordinal)"""
+    today = today or today_ordinal()
+    return _get_index()["stats"]["due"].bisect_left((today,))
+
+@instrument.timed()
+def upcoming_tasks(limit: int = 5) -> list:
+    """Open tasks with a due date, earliest first (overdue ones included)"""
+    index = _get_index()
+    tasks = (_lookup(index, "tasks", task_id) for _, task_id in index["stats"]["due"].head(limit))
+    return [t for t in tasks if t is not None]
+
+@instrument.timed()
+def add_comment(task_id: str, comment: str, author: str, expected_version: Optional[int] = None):
+    _commit({"op": "comment.add", "task_id": task_id, "comment": {
+        "id": str(uuid.uuid4()),
+        "text": comment,
+        "author": author,
+        "created_at": datetime.now().isoformat()
+    }}, versioned=("tasks", task_id, expected_version))
+
+def _history(kind: str, owner_id: str) -> list:
+    """Stored history entries plus those the open transaction has not written yet"""
+    entries = get_storage().history(kind, owner_id)
+    draft = getattr(_transaction, "draft", None)
+    pending = draft["records"] if draft is not None else ()
+    known = {entry.get("id") for entry in entries}
+    for pending_record in pending:
+        added, _deleted = storage.history_changes(pending_record)
+        if added is not None and added[:2] == (kind, owner_id):
+            for entry in added[2]:
+                if entry["id"] not in known:
+                    entries.append(entry)
+                    known.add(entry["id"])
+    return entries
+
+def _with_history(item: models.Record) -> dict:
+    """A task or client as a dict with its comments or meetings nested, the way
+    backups and the archive keep records"""
+    kind = item._history[0]
+    return dict(item.to_dict(), **{kind: _history(kind, item.id)})
+
+@instrument.timed()
+def get_comments(task_id: str) -> list:
+    """A task's comments, oldest first. Read from storage on every call, only open details need them."""
+    return [models.Comment.from_dict(c) for c in _history("comments", task_id)]
+
+@instrument.timed()
 def update_partners(partners: list):
-    data = load_data()
-    data["partners"] = partners
-    save_data(data)
+    _commit({"op": "partners.set", "partners": partners})
 
 def get_partner_names(data):
     """Extract partner names from partner objects"""
-    return [p["name"] if isinstance(p, dict) else p for p in data.get("partners", [])]
+    return [p if isinstance(p, str) else p.name for p in data.get("partners", [])]
 
 def get_partner_email(data, name):
     """Get email for a partner by name"""
     for p in data.get("partners", []):
-        if isinstance(p, dict) and p.get("name") == name:
-            return p.get("email", "")
+        if not isinstance(p, str) and p.name == name:
+            return p.email
     return ""
 
 # Client functions
@@ -157,53 +813,231 @@ def create_client(name: str, contact_name: str = "", contact_email: str = "",
         "phone": phone,
         "notes": notes,
         "status": status,  # Lead, Contacted, Meeting, Proposal, Negotiation, Won, Lost
-        "meetings": [],
+        "version": 1,
         "created_at": datetime.now().isoformat(),
         "updated_at": datetime.now().isoformat()
     }
 
+@instrument.timed()
 def add_client(client: dict):
-    data = load_data()
-    data["clients"].append(client)
-    save_data(data)
+    _commit({"op": "client.add", "client": client})
     return client
 
-def update_client(client_id: str, updates: dict):
-    data = load_data()
-    for i, client in enumerate(data["clients"]):
-        if client["id"] == client_id:
-            data["clients"][i].update(updates)
-            data["clients"][i]["updated_at"] = datetime.now().isoformat()
-            break
-    save_data(data)
+@instrument.timed()
+def update_client(client_id: str, updates: dict, expected_version: Optional[int] = None):
+    """Update a client. With expected_version, raise ConflictError if it changed meanwhile.
+
+    A new name is copied onto the client's tasks in the same transaction.
+    """
+    updates = dict(updates, updated_at=datetime.now().isoformat())
+    if "name" not in updates:
+        _commit({"op": "client.update", "id": client_id, "updates": updates},
+                versioned=("clients", client_id, expected_version))
+        return
+    with transaction():
+        _commit({"op": "client.update", "id": client_id, "updates": updates},
+                versioned=("clients", client_id, expected_version))
+        for task in get_client_tasks(client_id):
+            if task.get("client") != updates["name"]:
+                update_task(task["id"], {"client": updates["name"], "client_id": client_id})
 
+@instrument.timed()
 def delete_client(client_id: str):
-    data = load_data()
-    data["clients"] = [c for c in data["clients"] if c["id"] != client_id]
-    save_data(data)
+    """Delete a client. Its tasks are kept and unlinked from it."""
+    with transaction():
+        for task_id in get_client_task_ids(client_id):
+            update_task(task_id, {"client": "", "client_id": ""})
+        _commit({"op": "client.delete", "id": client_id})
 
+@instrument.timed()
 def get_client(client_id: str) -> Optional[dict]:
-    data = load_data()
-    for client in data["clients"]:
-        if client["id"] == client_id:
-            return client
-    return None
+    return _lookup(_get_index(), "clients", client_id)
 
+@instrument.timed()
 def add_meeting_to_client(client_id: str, summary: str, date: str, next_steps: str = ""):
-    data = load_data()
-    for client in data["clients"]:
-        if client["id"] == client_id:
-            client["meetings"].append({
-                "id": str(uuid.uuid4()),
-                "summary": summary,
-                "date": date,
-                "next_steps": next_steps,
-                "created_at": datetime.now().isoformat()
-            })
-            client["updated_at"] = datetime.now().isoformat()
-            break
-    save_data(data)
+    _commit({"op": "meeting.add", "client_id": client_id, "meeting": {
+        "id": str(uuid.uuid4()),
+        "summary": summary,
+        "date": date,
+        "next_steps": next_steps,
+        "created_at": datetime.now().isoformat()
+    }}, versioned=("clients", client_id, None))
+
+@instrument.timed()
+def get_meetings(client_id: str) -> list:
+    """A client's meetings, latest meeting date first. Read from storage on every call."""
+    meetings = [models.Meeting.from_dict(m) for m in _history("meetings", client_id)]
+    return sorted(meetings, key=lambda m: m.date or "", reverse=True)
+
+def _client_task_ids(index: dict, client_id: str) -> list:
+    linked = index["stats"]["client_tasks"].get(client_id)
+    if linked is None:
+        return []
+    return list(linked["open"]) + list(linked["done"])
+
+def get_client_task_ids(client_id: str) -> list:
+    """Ids of the tasks linked to a client, open ones first"""
+    return _client_task_ids(_get_index(), client_id)
+
+@instrument.timed()
+def get_client_tasks(client_id: str) -> list:
+    """Tasks linked to a client, open ones first, then by due date"""
+    index = _get_index()
+    tasks = [_lookup(index, "tasks", task_id) for task_id in _client_task_ids(index, client_id)]
+    return sorted(tasks, key=lambda t: (t.status == "Done", t.due_date or "~", t.id))
+
+@instrument.timed()
+def get_client_task_counts(client_id: str) -> dict:
+    """{"total", "pending", "done"} task counts for a client"""
+    linked = _get_index()["stats"]["client_tasks"].get(client_id)
+    pending = len(linked["open"]) if linked else 0
+    done = len(linked["done"]) if linked else 0
+    return {"total": pending + done, "pending": pending, "done": done}
+
+def _search_index(store: dict) -> search.SearchIndex:
+    """The published snapshot's search index, built on first use.
+
+    The build reads every history, so it runs against a snapshot without the
+    store lock. Records published meanwhile are collected, and the items they
+    touched are indexed again before the index is attached. Concurrent first
+    searches wait for one build, except in a transaction: its thread holds the
+    store lock the build needs at the end, so it builds its own.
+    """
+    with store["lock"]:
+        if store["current"]["index"]["search"] is not None:
+            return store["current"]["index"]["search"]
+    waited = store["search_lock"].acquire(blocking=not _in_transaction())
+    try:
+        with store["lock"]:
+            snapshot = store["current"]
+            if snapshot["index"]["search"] is not None:
+                return snapshot["index"]["search"]
+            pending = store["search_pending"] = []
+        built = search.SearchIndex()
+        comments = dict(get_storage().history_items("comments"))
+        meetings = dict(get_storage().history_items("meetings"))
+        for task in snapshot["index"]["tasks"].values():
+            built.index("tasks", task.id, search.task_fields(task),
+                        search.comment_fields(comments.get(task.id, ())))
+        for client in snapshot["index"]["clients"].values():
+            built.index("clients", client.id, search.client_fields(client),
+                        search.meeting_fields(meetings.get(client.id, ())))
+        with store["lock"]:
+            # Otherwise the document was replaced or another build started: this one only answers its search
+            if store["search_pending"] is pending:
+                store["search_pending"] = None
+                index = store["current"]["index"]
+                index["search"] = built
+                touched, _deleted, added = _touched(pending)
+                keys = dict(touched)
+                for history_kind, owner_id, _entries in added:
+                    keys[("tasks" if history_kind == "comments" else "clients", owner_id)] = None
+                # The histories read above may hold some of their entries already, so they're read again
+                for kind, item_id in keys:
+                    _reindex(index, kind, item_id, True)
+        return built
+    finally:
+        if waited:
+            store["search_lock"].release()
+
+@instrument.timed()
+def search_records(text: str, limit: int = 20) -> list:
+    """(kind, item) pairs matching text, best first. kind is "tasks" or "clients"."""
+    store = _store()
+    search_index = store["current"]["index"]["search"] or _search_index(store)
+    index = store["current"]["index"]
+    results = []
+    for kind, item_id, _score in search_index.search(text, limit):
+        item = _lookup(index, kind, item_id)
+        if item is not None:
+            results.append((kind, item))
+    return results
+
+def _archivable(task: models.Task, cutoff: int) -> bool:
+    if task.status != "Done":
+        return False
+    completed = date_ordinal(task.completed_at or task.updated_at)
+    return completed is not None and completed < cutoff
+
+@instrument.timed()
+def archive_done_tasks(older_than_days: Optional[int] = None) -> int:
+    """Move tasks Done for more than older_than_days (default ARCHIVE_AFTER_DAYS) to the archive.
+
+    Returns how many moved. Tasks reach the archive before they leave the
+    working set, so a crash in between leaves a copy in both, never in neither.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = today_ordinal() - days
+    if not any(_archivable(task, cutoff) for task in load_data()["tasks"]):
+        return 0
+    with transaction():
+        stale = [task for task in load_data()["tasks"] if _archivable(task, cutoff)]
+        if stale:
+            archive.add(ARCHIVE_DIR, [_with_history(task) for task in stale])
+        for task in stale:
+            delete_task(task.id)
+    return len(stale)
+
+def archive_if_due():
+    """Run the automatic archive pass, at most once a day per process.
+
+    The backup worker calls it, so no rerun waits for it.
+    """
+    store = _shared_store()
+    today = today_ordinal()
+    if not ARCHIVE_AFTER_DAYS or store["archived_on"] == today:
+        return
+    store["archived_on"] = today
+    try:
+        archive_done_tasks()
+        archive.compact(ARCHIVE_DIR)
+    except OSError:
+        pass  # On read-only filesystem, everything stays in the working set
+
+@instrument.timed()
+def get_archived_tasks() -> list:
+    """Archived tasks, most recently completed first. The archive is read on first use."""
+    hot = _get_index()["tasks"]
+    return [task for task in archive.load(ARCHIVE_DIR) if task.id not in hot]
+
+@instrument.timed()
+def search_archive(text: str, limit: int = 50) -> list:
+    """Archived tasks matching text, best first"""
+    hot = _get_index()["tasks"]
+    return [task for task in archive.search_tasks(ARCHIVE_DIR, text, limit) if task.id not in hot]
+
+@instrument.timed()
+def restore_archived_task(task_id: str) -> Optional[dict]:
+    """Move a task from the archive back into the working set.
+
+    It counts as completed now, so the next archive pass keeps it for a full
+    period again. Returns the task, or None if it is not archived.
+    """
+    store = _shared_store()
+    with store["lock"], get_storage().lock:
+        task = archive.get(ARCHIVE_DIR, task_id)
+        if task is None:
+            return None
+        # Added (and persisted) before it leaves the archive, like archive_done_tasks()
+        if get_task(task_id) is None:
+            add_task(dict(task.to_dict(), completed_at=datetime.now().isoformat()))
+        archive.remove(ARCHIVE_DIR, [task_id])
+    return get_task(task_id)
 
 def get_client_names(data):
     """Extract client names"""
     return [c["name"] for c in data.get("clients", [])]
+
+_BATCH_OPERATIONS = {
+    f.__name__: f for f in (
+        add_task, update_task, delete_task, add_comment, update_partners,
+        add_client, update_client, delete_client, add_meeting_to_client
+    )
+}
+
+@instrument.timed()
+def apply_batch(ops: list):
+    """Run mutations given as (function_name, *args) tuples in one transaction"""
+    with transaction():
+        for name, *args in ops:
+            _BATCH_OPERATIONS[name](*args)
@@ -0,0 +1,164 @@
+"""Streaming export of tasks and clients.
+
+Nested lists are flattened into their own tables, so every table is flat:
+tasks, task_links, task_comments, clients and client_meetings, joined on
+task_id / client_id. Comments and meetings are stored apart from their
+tasks and clients, so they are fetched per item through the given
+get_comments / get_meetings functions. Rows are generated lazily and
+written chunk by chunk to temporary files, then bundled into one zip, so
+memory stays bounded by the chunk size rather than the store size.
+
+CSV and JSONL are always available, Parquet when pyarrow is installed.
+pyarrow is only imported once a Parquet export runs.
+"""
+import csv
+import functools
+import importlib.util
+import json
+import os
+import tempfile
+import zipfile
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+from utils import instrument
+
+CHUNK_SIZE = 1000
+
+# table -> (source, columns). Columns are (name, type), type "str" or "int".
+TABLES = {
+    "tasks": ("tasks", [
+        ("id", "str"), ("title", "str"), ("description", "str"), ("status", "str"),
+        ("priority", "str"), ("assignee", "str"), ("category", "str"), ("due_date", "str"),
+        ("client_id", "str"), ("client", "str"), ("meeting_summary", "str"),
+        ("link_count", "int"), ("comment_count", "int"), ("version", "int"),
+        ("created_at", "str"), ("updated_at", "str"), ("completed_at", "str"),
+    ]),
+    "task_links": ("tasks", [("task_id", "str"), ("position", "int"), ("url", "str")]),
+    "task_comments": ("tasks", [
+        ("id", "str"), ("task_id", "str"), ("author", "str"), ("text", "str"), ("created_at", "str"),
+    ]),
+    "clients": ("clients", [
+        ("id", "str"), ("name", "str"), ("status", "str"), ("contact_name", "str"),
+        ("contact_email", "str"), ("phone", "str"), ("notes", "str"), ("meeting_count", "int"),
+        ("version", "int"), ("created_at", "str"), ("updated_at", "str"),
+    ]),
+    "client_meetings": ("clients", [
+        ("id", "str"), ("client_id", "str"), ("date", "str"), ("summary", "str"),
+        ("next_steps", "str"), ("created_at", "str"),
+    ]),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def formats() -> tuple:
+    """Export formats usable in this environment"""
+    # Parquet export is optional
+    return ("csv", "jsonl", "parquet") if importlib.util.find_spec("pyarrow") else ("csv", "jsonl")
+
+
+def _rows(table: str, items: Iterable, history: Optional[Callable] = None) -> Iterator[dict]:
+    for item in items:
+        if table == "tasks":
+            yield {
+                "id": item.id, "title": item.title, "description": item.description,
+                "status": item.status, "priority": item.priority, "assignee": item.assignee,
+                "category": item.category, "due_date": item.due_date, "client_id": item.client_id,
+                "client": item.client, "meeting_summary": item.meeting_summary,
+                "link_count": len(item.links), "comment_count": item.comment_count,
+                "version": item.version, "created_at": item.created_at, "updated_at": item.updated_at,
+                "completed_at": item.completed_at,
+            }
+        elif table == "task_links":
+            for position, url in enumerate(item.links):
+                yield {"task_id": item.id, "position": position, "url": url}
+        elif table == "task_comments":
+            for comment in history(item.id):
+                yield {"id": comment.id, "task_id": item.id, "author": comment.author,
+                       "text": comment.text, "created_at": comment.created_at}
+        elif table == "clients":
+            yield {
+                "id": item.id, "name": item.name, "status": item.status,
+                "contact_name": item.contact_name, "contact_email": item.contact_email,
+                "phone": item.phone, "notes": item.notes, "meeting_count": item.meeting_count,
+                "version": item.version, "created_at": item.created_at, "updated_at": item.updated_at,
+            }
+        elif table == "client_meetings":
+            for meeting in history(item.id):
+                yield {"id": meeting.id, "client_id": item.id, "date": meeting.date,
+                       "summary": meeting.summary, "next_steps": meeting.next_steps,
+                       "created_at": meeting.created_at}
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_table(path: str, table: str, items: Iterable, fmt: str, chunk_size: int = CHUNK_SIZE,
+                history: Optional[Callable] = None) -> int:
+    """Write one table to path, chunk by chunk. Returns the row count.
+
+    history fetches an item's comments or meetings, for the tables holding them.
+    """
+    columns = TABLES[table][1]
+    names = [name for name, _ in columns]
+    count = 0
+    chunks = _chunks(_rows(table, items, history), chunk_size)
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=names)
+            writer.writeheader()
+            for chunk in chunks:
+                writer.writerows(chunk)
+                count += len(chunk)
+    elif fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk))
+                count += len(chunk)
+    elif fmt == "parquet":
+        if "parquet" not in formats():
+            raise ValueError("Parquet export needs pyarrow")
+        pyarrow = instrument.import_module("pyarrow")
+        instrument.import_module("pyarrow.parquet")
+        types = {"str": pyarrow.string(), "int": pyarrow.int64()}
+        schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                writer.write_batch(pyarrow.RecordBatch.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return count
+
+
+def export_tables(fmt: str, tasks: Iterable, clients: Iterable, tables: Iterable[str] = TABLES,
+                  chunk_size: int = CHUNK_SIZE, get_comments: Callable = lambda task_id: (),
+                  get_meetings: Callable = lambda client_id: ()) -> str:
+    """Write the chosen tables into a zip in the temp directory and return its path.
+
+    tasks and clients may be any re-iterable collection (each table walks them
+    once). get_comments and get_meetings return the comments of a task id and
+    the meetings of a client id. The caller owns the returned file.
+    """
+    sources = {"tasks": tasks, "clients": clients}
+    histories = {"task_comments": get_comments, "client_meetings": get_meetings}
+    fd, zip_path = tempfile.mkstemp(prefix="climetrix_export_", suffix=".zip")
+    os.close(fd)
+    counts = {}
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        for table in tables:
+            fd, table_path = tempfile.mkstemp(suffix="." + fmt)
+            os.close(fd)
+            try:
+                counts[table] = write_table(table_path, table, sources[TABLES[table][0]], fmt, chunk_size,
+                                            histories.get(table))
+                bundle.write(table_path, f"{table}.{fmt}")
+            finally:
+                os.remove(table_path)
+        bundle.writestr("manifest.json", json.dumps({"format": fmt, "rows": counts}, indent=2))
+    return zip_path
@@ -1,4 +1,6 @@
 from datetime import datetime, date
+from functools import lru_cache
+from typing import Optional
 
 def get_priority_color(priority: str) -> str:
     colors = {
@@ -16,41 +18,48 @@ def get_status_color(status: str) -> str:
     }
     return colors.get(status, "#9E9E9E")
 
+@lru_cache(maxsize=4096)
+def parse_date(value) -> Optional[date]:
+    """Date of an ISO date or datetime string, None if missing or invalid"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except (TypeError, ValueError):
+        return None
+
+def date_ordinal(value) -> Optional[int]:
+    """Proleptic ordinal of an ISO date string, for date arithmetic"""
+    parsed = parse_date(value)
+    return parsed.toordinal() if parsed else None
+
+def today_ordinal() -> int:
+    return date.today().toordinal()
+
+@lru_cache(maxsize=4096)
+def format_ordinal(ordinal: int) -> str:
+    return date.fromordinal(ordinal).strftime("%b %d, %Y")
+
 def format_date(date_str: str) -> str:
     if not date_str:
         return "No due date"
-    try:
-        dt = datetime.fromisoformat(date_str)
-        return dt.strftime("%b %d, %Y")
-    except:
-        return date_str
-
-def is_overdue(due_date_str: str) -> bool:
-    if not due_date_str:
-        return False
-    try:
-        due = datetime.fromisoformat(due_date_str).date()
-        return due < date.today()
-    except:
-        return False
-
-def days_until_due(due_date_str: str) -> int:
-    if not due_date_str:
-        return 999
-    try:
-        due = datetime.fromisoformat(due_date_str).date()
-        return (due - date.today()).days
-    except:
-        return 999
+    parsed = parse_date(date_str)
+    return format_ordinal(parsed.toordinal()) if parsed else date_str
+
+def is_overdue(due_ordinal: Optional[int], today: int) -> bool:
+    return due_ordinal is not None and due_ordinal < today
+
+def days_until_due(due_ordinal: Optional[int], today: int) -> int:
+    return 999 if due_ordinal is None else due_ordinal - today
 
-def get_due_date_badge(due_date_str: str, status: str) -> tuple:
+def get_due_date_badge(due_ordinal: Optional[int], status: str, today: int) -> tuple:
     """Returns (text, color) for due date badge"""
     if status == "Done":
         return ("Completed", "#4CAF50")
-    if not due_date_str:
+    if due_ordinal is None:
         return ("No deadline", "#9E9E9E")
 
-    days = days_until_due(due_date_str)
+    days = days_until_due(due_ordinal, today)
     if days < 0:
         return (f"Overdue by {-days}d", "#D32F2F")
     elif days == 0:
@@ -58,4 +67,4 @@ def get_due_date_badge(due_date_str: str, status: str) -> tuple:
     elif days <= 3:
         return (f"Due in {days}d", "#FF9800")
     else:
-        return (format_date(due_date_str), "#9E9E9E")
+        return (format_ordinal(due_ordinal), "#9E9E9E")
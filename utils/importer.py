@@ -0,0 +1,183 @@
+"""Bulk import of tasks and clients from CSV or JSONL.
+
+Rows are read lazily, validated against the current partners, categories
+and clients, and deduplicated by a natural key: title, client and due date
+for tasks, and name for clients. Keys are compared case-insensitively
+against both the store and earlier rows of the same file. Rows that pass
+are committed in one data_manager.transaction(), which means one backup
+and one batched write. Every rejected row is reported with its row number.
+A file that can't be read at all (not UTF-8, malformed CSV) raises
+ImportFileError and nothing is added.
+"""
+import codecs
+import csv
+import json
+from typing import Callable, Iterable, Iterator, Optional
+
+from utils import data_manager, models
+from utils.helpers import parse_date
+
+# Columns understood per kind. Only title (tasks) and name (clients) are required.
+TASK_COLUMNS = ("title", "description", "assignee", "priority", "status", "category",
+                "due_date", "client", "links", "meeting_summary")
+CLIENT_COLUMNS = ("name", "contact_name", "contact_email", "phone", "notes", "status")
+
+# Rows between calls of the progress callback
+PROGRESS_EVERY = 1000
+
+
+class ImportFileError(Exception):
+    """The file as a whole can't be read, so none of it is imported"""
+
+
+def read_rows(fileobj, fmt: str) -> Iterator[dict]:
+    """Rows of an uploaded CSV or JSONL file (binary or text), one at a time"""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown import format: {fmt}")
+    lines = fileobj
+    if isinstance(fileobj.read(0), bytes):
+        lines = codecs.getreader("utf-8-sig")(fileobj)
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(lines)
+        else:
+            for line in lines:
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        row = {"_error": f"Invalid JSON: {e.msg}"}
+                    yield row if isinstance(row, dict) else {"_error": "Each line must be a JSON object"}
+    except UnicodeDecodeError:
+        raise ImportFileError('The file is not UTF-8 text. In Excel, save it as "CSV UTF-8".') from None
+    except csv.Error as e:
+        raise ImportFileError(f"Malformed CSV: {e}") from None
+
+
+def _text(row: dict, column: str) -> str:
+    value = row.get(column)
+    return "" if value is None else str(value).strip()
+
+
+def _task_key(title: str, client_id: str, due_date: Optional[str]) -> tuple:
+    return (title.casefold(), client_id, due_date or "")
+
+
+def _validate_task(row: dict, partners: set, categories: set, clients: dict) -> dict:
+    """Task dict for a row. Raises ValueError naming the first problem."""
+    title = _text(row, "title")
+    if not title:
+        raise ValueError("title is required")
+
+    assignee = _text(row, "assignee")
+    if assignee and assignee not in partners:
+        raise ValueError(f"unknown assignee '{assignee}'")
+    priority = _text(row, "priority") or "Medium"
+    if priority not in models.PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(models.PRIORITIES)}")
+    status = _text(row, "status") or "To Do"
+    if status not in models.STATUSES:
+        raise ValueError(f"status must be one of {', '.join(models.STATUSES)}")
+    category = _text(row, "category") or "General"
+    if category not in categories:
+        raise ValueError(f"unknown category '{category}'")
+
+    due_date = None
+    if _text(row, "due_date"):
+        parsed = parse_date(_text(row, "due_date"))
+        if parsed is None:
+            raise ValueError(f"invalid due_date '{_text(row, 'due_date')}'")
+        due_date = parsed.isoformat()
+
+    client = None
+    if _text(row, "client"):
+        client = clients.get(_text(row, "client").casefold())
+        if client is None:
+            raise ValueError(f"unknown client '{_text(row, 'client')}'")
+
+    links = row.get("links") or []
+    if isinstance(links, str):
+        links = [l.strip() for l in links.replace("|", "\n").splitlines() if l.strip()]
+    elif not isinstance(links, list) or not all(isinstance(l, str) for l in links):
+        raise ValueError("links must be a list of strings, or one string separated by | or newlines")
+
+    task = data_manager.create_task(
+        title=title, description=_text(row, "description"), assignee=assignee,
+        priority=priority, due_date=due_date, category=category, links=list(links),
+        meeting_summary=_text(row, "meeting_summary"),
+        client=client.name if client else "", client_id=client.id if client else ""
+    )
+    task["status"] = status
+    if status == "Done":
+        task["completed_at"] = task["updated_at"]
+    return task
+
+
+def _validate_client(row: dict) -> dict:
+    name = _text(row, "name")
+    if not name:
+        raise ValueError("name is required")
+    status = _text(row, "status") or "Lead"
+    if status not in models.CLIENT_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(models.CLIENT_STATUSES)}")
+    return data_manager.create_client(
+        name=name, contact_name=_text(row, "contact_name"), contact_email=_text(row, "contact_email"),
+        phone=_text(row, "phone"), notes=_text(row, "notes"), status=status
+    )
+
+
+def import_rows(rows: Iterable[dict], kind: str = "tasks",
+                progress: Optional[Callable[[int], None]] = None) -> dict:
+    """Validate and add tasks or clients in one transaction.
+
+    Returns {"added", "skipped", "errors"}, where skipped counts duplicates
+    and errors lists (row number, message) pairs. Row numbers start at 1
+    for the first data row.
+    """
+    if kind not in ("tasks", "clients"):
+        raise ValueError(f"Unknown import kind: {kind}")
+    report = {"added": 0, "skipped": 0, "errors": []}
+
+    with data_manager.transaction():
+        data = data_manager.load_data()
+        partners = set(data_manager.get_partner_names(data))
+        categories = set(data["categories"])
+        clients = {}
+        for client in data["clients"]:
+            clients.setdefault(client.name.casefold(), client)
+        if kind == "tasks":
+            seen = {_task_key(t.title, t.client_id, t.due_date) for t in data["tasks"]}
+        else:
+            seen = set(clients)
+
+        for number, row in enumerate(rows, start=1):
+            if progress is not None and number % PROGRESS_EVERY == 0:
+                progress(number)
+            try:
+                if "_error" in row:
+                    raise ValueError(row["_error"])
+                if kind == "tasks":
+                    item = _validate_task(row, partners, categories, clients)
+                    key = _task_key(item["title"], item["client_id"], item["due_date"])
+                else:
+                    item = _validate_client(row)
+                    key = item["name"].casefold()
+            except ValueError as e:
+                report["errors"].append((number, str(e)))
+                continue
+            if key in seen:
+                report["skipped"] += 1
+                continue
+            seen.add(key)
+            if kind == "tasks":
+                data_manager.add_task(item)
+            else:
+                data_manager.add_client(item)
+            report["added"] += 1
+    return report
+
+
+def import_file(fileobj, fmt: str, kind: str = "tasks",
+                progress: Optional[Callable[[int], None]] = None) -> dict:
+    """import_rows() over an uploaded CSV or JSONL file"""
+    return import_rows(read_rows(fileobj, fmt), kind, progress)
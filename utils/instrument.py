@@ -0,0 +1,240 @@
+"""Lightweight performance instrumentation.
+
+Functions wrapped with @timed() and blocks run under span() record their call
+count and wall time by name. count() adds up quantities such as bytes written,
+and sample() records sizes such as widgets per rerun. The most recent WINDOW
+values of every metric are kept for percentiles, so the diagnostics reflect
+current behaviour rather than the whole process lifetime. Metrics are
+process-wide, shared by every session.
+
+Collection is off unless CLIMETRIX_INSTRUMENT=1 or enable() is called. While
+off, a wrapped function costs one global lookup on top of the call itself.
+When CLIMETRIX_METRICS_LOG names a file, every recorded value is also appended
+to it as a JSON line for offline analysis.
+
+Startup costs are noted whether or not collection is on, since they only
+happen once: note_startup() keeps the first value of each phase and
+import_module() times the first import of modules loaded on demand.
+"""
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Values kept per metric for percentiles
+WINDOW = 500
+
+# Buffered log lines are written out once this many accumulate, or on flush()
+LOG_BUFFER = 200
+
+_enabled = os.environ.get("CLIMETRIX_INSTRUMENT") == "1"
+_log_file = os.environ.get("CLIMETRIX_METRICS_LOG") or None
+_lock = threading.Lock()
+_metrics = {}  # name -> _Metric
+_log_buffer = []
+_startup = {}  # phase -> seconds, first value only
+_imports = {}  # module -> seconds its first import took
+
+
+class _Metric:
+    __slots__ = ("kind", "calls", "total", "window")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.calls = 0
+        self.total = 0.0
+        self.window = deque(maxlen=WINDOW)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(log_file: Optional[str] = None):
+    """Start collecting, optionally also logging to log_file"""
+    global _enabled, _log_file
+    _enabled = True
+    if log_file is not None:
+        _log_file = log_file
+
+
+def disable():
+    global _enabled
+    flush()
+    _enabled = False
+
+
+def log_file() -> Optional[str]:
+    return _log_file
+
+
+def _record(kind: str, name: str, value: float):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = _Metric(kind)
+        metric.calls += 1
+        metric.total += value
+        metric.window.append(value)
+        if _log_file is not None:
+            _log_buffer.append({"ts": time.time(), "kind": kind, "name": name, "value": value})
+            if len(_log_buffer) < LOG_BUFFER:
+                return
+    if _log_file is not None:
+        flush()
+
+
+def count(name: str, amount: float):
+    """Add amount to a running total, e.g. bytes written"""
+    if _enabled:
+        _record("count", name, amount)
+
+
+def sample(name: str, value: float):
+    """Record one observation of a size, e.g. widgets in a rerun"""
+    if _enabled:
+        _record("size", name, value)
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record("time", self.name, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """Context manager timing its block under name"""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name: Optional[str] = None):
+    """Decorator timing every call. The name defaults to file.function."""
+    def decorate(fn):
+        # The file name rather than __module__, which is "__main__" for app.py under streamlit run
+        module = os.path.splitext(os.path.basename(fn.__code__.co_filename))[0]
+        metric = name or f"{module}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Also on exceptions: st.rerun() and st.stop() leave a render early by raising
+                _record("time", metric, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def flush():
+    """Write buffered log lines to the log file"""
+    with _lock:
+        lines, _log_buffer[:] = list(_log_buffer), []
+    if not lines or _log_file is None:
+        return
+    try:
+        with open(_log_file, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+    except OSError:
+        pass  # On read-only filesystem, metrics stay in memory
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _log_buffer.clear()
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summary() -> list:
+    """One row per metric: kind, lifetime calls and total, percentiles over the window"""
+    with _lock:
+        metrics = [(name, m.kind, m.calls, m.total, sorted(m.window)) for name, m in _metrics.items()]
+    rows = []
+    for name, kind, calls, total, ordered in metrics:
+        if not ordered:
+            continue
+        rows.append({
+            "name": name, "kind": kind, "calls": calls, "total": total,
+            "p50": _percentile(ordered, 0.5), "p90": _percentile(ordered, 0.9),
+            "p99": _percentile(ordered, 0.99), "max": ordered[-1],
+        })
+    rows.sort(key=lambda row: (row["kind"], -row["total"]))
+    return rows
+
+
+def snapshot() -> str:
+    """The summary as a JSON document"""
+    return json.dumps({"created_at": time.time(), "window": WINDOW, "startup": startup_report(),
+                       "metrics": summary()}, indent=2)
+
+
+def import_module(name: str):
+    """importlib.import_module() for heavy modules only some pages need, timing the first import"""
+    module = sys.modules.get(name)
+    # While another thread runs the import, the entry is there but half initialized;
+    # importlib.import_module() waits for it
+    if module is not None and not getattr(module.__spec__, "_initializing", False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _imports.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def note_startup(phase: str, seconds: float):
+    """Record how long a startup phase took. Later calls for the same phase are ignored."""
+    _startup.setdefault(phase, seconds)
+
+
+def startup_report() -> dict:
+    """Startup phases and on-demand imports, in seconds"""
+    return {"phases": dict(_startup), "imports": dict(_imports)}
+
+
+def widgets_this_run() -> Optional[int]:
+    """Widgets registered by the current Streamlit script run, if Streamlit exposes it"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    # Newer Streamlit keeps the set on ctx.shared, older versions on the context itself
+    ids = getattr(getattr(ctx, "shared", None), "widget_ids_this_run", None)
+    if ids is None:
+        ids = getattr(ctx, "widget_ids_this_run", None)
+    if ids is None:
+        return None
+    snapshot_ids = getattr(ids, "snapshot", None)
+    return len(snapshot_ids() if snapshot_ids is not None else ids)
@@ -0,0 +1,231 @@
+"""Typed in-memory records for the task store.
+
+Tasks, clients and their comments, meetings and partners are held as slotted
+dataclasses instead of dicts, which keeps per-record memory down and lets hot
+loops use attribute access. Status, priority, category and assignee values
+are interned, so every record shares one string object per distinct value.
+
+Comments and meetings are stored out of line, one history per task or
+client (see storage), so a task or client only carries a summary of its
+history: the count and the time of the last entry.
+
+The storage layer still reads and writes plain JSON: from_dict / to_dict
+convert at that boundary. Records also answer item access (task["title"],
+task.get("client")) so code written against the dicts keeps working, and
+keys the model does not know are carried in `extra` and written back.
+"""
+import sys
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional
+
+STATUSES = ("To Do", "In Progress", "Done")
+PRIORITIES = ("High", "Medium", "Low")
+CLIENT_STATUSES = ("Lead", "Contacted", "Meeting", "Proposal", "Negotiation", "Won", "Lost")
+
+
+class Record:
+    """Dict-style access and JSON conversion shared by the models"""
+    __slots__ = ()
+
+    _names = frozenset()  # model fields, set by _model
+    _order = ()  # the same, in declaration order
+    _interned = ()  # fields whose string values are interned
+    _nested = {}  # list fields holding other models
+    _history = None  # (history kind, count field, last entry field) for models with a history
+
+    @classmethod
+    def from_dict(cls, values):
+        """Model for a JSON dict. Instances of the model are returned as is."""
+        if isinstance(values, cls):
+            return values
+        known = {}
+        extra = None
+        for key, value in values.items():
+            if key in cls._names:
+                known[key] = cls._coerce(cls, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        return cls(**known, extra=extra)
+
+    def to_dict(self) -> dict:
+        values = {}
+        for name in self._order:
+            value = getattr(self, name)
+            if name in self._nested:
+                value = [v.to_dict() for v in value]
+            elif isinstance(value, list):
+                value = list(value)
+            values[name] = value
+        if self.extra:
+            values.update(self.extra)
+        return values
+
+    def _coerce(self, key, value):
+        if key in self._interned and isinstance(value, str):
+            return sys.intern(value)
+        model = self._nested.get(key)
+        if model is not None:
+            return [model.from_dict(v) for v in value or []]
+        return value
+
+    def __getitem__(self, key):
+        if key in self._names:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._names:
+            setattr(self, key, self._coerce(key, value))
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self._names or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        if key in self._names:
+            return getattr(self, key)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    @classmethod
+    def split_history(cls, values) -> Optional[list]:
+        """Pop a history list nested in values (a dict or a model) and fill in its summary.
+
+        Older documents, backups and the archive nest comments and meetings in
+        their records. Returns the entries as dicts, or None when there was no list.
+        """
+        kind, count, last = cls._history
+        nested = values.extra if isinstance(values, Record) else values
+        entries = nested.pop(kind, None) if nested else None
+        if entries is None:
+            return None
+        entries = [e.to_dict() if isinstance(e, Record) else e for e in entries]
+        values[count] = len(entries)
+        values[last] = max((e.get("created_at") or "" for e in entries), default="") or None
+        return entries
+
+    def items(self):
+        return self.to_dict().items()
+
+    def copy(self):
+        """A copy to change instead of this record, which readers may still hold.
+        Values are shared, except extra, which update() changes in place."""
+        return replace(self, extra=dict(self.extra) if self.extra else None)
+
+    def update(self, values):
+        items = values.to_dict().items() if isinstance(values, Record) else values.items()
+        for key, value in items:
+            self[key] = value
+
+
+def _model(cls):
+    cls = dataclass(slots=True)(cls)
+    cls._order = tuple(f.name for f in fields(cls) if f.name != "extra")
+    cls._names = frozenset(cls._order)
+    return cls
+
+
+@_model
+class Comment(Record):
+    id: str = ""
+    text: str = ""
+    author: str = ""
+    created_at: str = ""
+    extra: Optional[dict] = None
+
+
+@_model
+class Meeting(Record):
+    id: str = ""
+    summary: str = ""
+    date: str = ""
+    next_steps: str = ""
+    created_at: str = ""
+    extra: Optional[dict] = None
+
+
+@_model
+class Partner(Record):
+    _interned = ("name",)
+
+    name: str = ""
+    email: str = ""
+    extra: Optional[dict] = None
+
+
+@_model
+class Task(Record):
+    _interned = ("status", "priority", "category", "assignee", "client", "client_id")
+    _history = ("comments", "comment_count", "last_comment_at")
+
+    id: str = ""
+    title: str = ""
+    description: str = ""
+    assignee: str = ""
+    priority: str = "Medium"
+    status: str = "To Do"
+    due_date: Optional[str] = None
+    due_ordinal: Optional[int] = None
+    category: str = "General"
+    links: list = field(default_factory=list)
+    meeting_summary: str = ""
+    client: str = ""
+    client_id: str = ""
+    comment_count: int = 0
+    last_comment_at: Optional[str] = None
+    version: int = 0
+    created_at: str = ""
+    updated_at: str = ""
+    completed_at: Optional[str] = None  # when the task last became Done
+    extra: Optional[dict] = None
+
+
+@_model
+class Client(Record):
+    _interned = ("status",)
+    _history = ("meetings", "meeting_count", "last_meeting_at")
+
+    id: str = ""
+    name: str = ""
+    contact_name: str = ""
+    contact_email: str = ""
+    phone: str = ""
+    notes: str = ""
+    status: str = "Lead"
+    meeting_count: int = 0
+    last_meeting_at: Optional[str] = None
+    version: int = 0
+    created_at: str = ""
+    updated_at: str = ""
+    extra: Optional[dict] = None
+
+
+def load_document(data: dict) -> dict:
+    """Convert a JSON document's records to models, in place"""
+    data["tasks"] = [Task.from_dict(t) for t in data.get("tasks", [])]
+    data["clients"] = [Client.from_dict(c) for c in data.get("clients", [])]
+    data["partners"] = [p if isinstance(p, str) else Partner.from_dict(p) for p in data.get("partners", [])]
+    data["categories"] = [sys.intern(c) for c in data.get("categories", [])]
+    return data
+
+
+def split_histories(data: dict) -> dict:
+    """Move comment and meeting lists nested in data's records out, in place.
+
+    Returns {"comments": {task id: entries}, "meetings": {client id: entries}}.
+    """
+    history = {"comments": {}, "meetings": {}}
+    for key, model in (("tasks", Task), ("clients", Client)):
+        for item in data.get(key, []):
+            entries = model.split_history(item)
+            if entries is not None:
+                history[model._history[0]][item["id"]] = entries
+    return history
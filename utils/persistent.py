@@ -0,0 +1,208 @@
+"""Copy-on-write containers for the store's snapshots.
+
+A writer forks the containers of the published snapshot and changes the
+fork; the snapshot's readers keep seeing the old contents. fork() only
+copies what changed recently, not the whole container, so a write costs
+the same on a small store and a large one.
+
+Map keeps the entries changed since it was last folded in a small overlay
+over a shared base dict; a fork copies the overlay and folds it into a new
+base once it outgrows the square root of the size. SortedList keeps its
+values in chunks; a fork shares every chunk and copies one the first time
+it changes it.
+"""
+from bisect import bisect_left, insort
+from itertools import chain, islice
+from math import isqrt
+from typing import Iterator
+
+# Overlay entries a Map may carry before a fork folds them into its base
+FOLD_MIN = 64
+
+_UNCHANGED = object()
+_DELETED = object()
+
+
+class Map:
+    """Insertion-ordered mapping, like dict, with a cheap fork().
+
+    Updating a key keeps its position, and a key deleted and added again
+    moves to the end, as in a dict.
+    """
+
+    __slots__ = ("_base", "_changes", "_tail", "_len")
+
+    def __init__(self, items=()):
+        self._base = dict(items)  # never changed once shared
+        self._changes = {}  # key of the base -> new value, or _DELETED
+        self._tail = {}  # keys added since the base was made, in order
+        self._len = len(self._base)
+
+    def fork(self) -> "Map":
+        other = Map.__new__(Map)
+        if len(self._changes) + len(self._tail) > max(FOLD_MIN, isqrt(self._len)):
+            other._base, other._changes, other._tail = dict(self.items()), {}, {}
+        else:
+            other._base, other._changes, other._tail = self._base, dict(self._changes), dict(self._tail)
+        other._len = self._len
+        return other
+
+    def _live(self, key) -> bool:
+        """True if key is a base key that hasn't been deleted"""
+        return key in self._base and self._changes.get(key) is not _DELETED
+
+    def get(self, key, default=None):
+        if key in self._tail:
+            return self._tail[key]
+        value = self._changes.get(key, _UNCHANGED)
+        if value is _UNCHANGED:
+            return self._base.get(key, default)
+        return default if value is _DELETED else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _DELETED)
+        if value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._tail:
+            self._tail[key] = value
+        elif self._live(key):
+            self._changes[key] = value
+        else:
+            self._tail[key] = value
+            self._len += 1
+
+    def __delitem__(self, key):
+        if key in self._tail:
+            del self._tail[key]
+        elif self._live(key):
+            self._changes[key] = _DELETED
+        else:
+            raise KeyError(key)
+        self._len -= 1
+
+    def pop(self, key, default=None):
+        value = self.get(key, _DELETED)
+        if value is _DELETED:
+            return default
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _DELETED)
+        if value is _DELETED:
+            self[key] = value = default
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _DELETED) is not _DELETED
+
+    def __len__(self) -> int:
+        return self._len
+
+    def items(self) -> Iterator[tuple]:
+        changes = self._changes
+        if changes:
+            for key, value in self._base.items():
+                change = changes.get(key, _UNCHANGED)
+                if change is _UNCHANGED:
+                    yield key, value
+                elif change is not _DELETED:
+                    yield key, change
+        else:
+            yield from self._base.items()
+        yield from self._tail.items()
+
+    def keys(self) -> Iterator:
+        return (key for key, _value in self.items())
+
+    def values(self) -> Iterator:
+        return (value for _key, value in self.items())
+
+    __iter__ = keys
+
+
+class SortedList:
+    """Sorted list of comparable values, with a cheap fork()"""
+
+    __slots__ = ("_chunks", "_maxes", "_owned", "_len")
+
+    CHUNK = 256
+
+    def __init__(self, values=()):
+        values = sorted(values)
+        self._chunks = [values[i:i + self.CHUNK] for i in range(0, len(values), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._owned = {id(chunk) for chunk in self._chunks}  # chunks no other copy holds
+        self._len = len(values)
+
+    def fork(self) -> "SortedList":
+        other = SortedList.__new__(SortedList)
+        other._chunks, other._maxes, other._len = list(self._chunks), list(self._maxes), self._len
+        other._owned = set()
+        self._owned = set()  # Both copy a shared chunk before changing it
+        return other
+
+    def _own(self, position: int) -> list:
+        chunk = self._chunks[position]
+        if id(chunk) not in self._owned:
+            chunk = self._chunks[position] = list(chunk)
+            self._owned.add(id(chunk))
+        return chunk
+
+    def add(self, value):
+        if not self._chunks:
+            chunk = [value]
+            self._chunks.append(chunk)
+            self._maxes.append(value)
+            self._owned.add(id(chunk))
+        else:
+            position = min(bisect_left(self._maxes, value), len(self._chunks) - 1)
+            chunk = self._own(position)
+            insort(chunk, value)
+            self._maxes[position] = chunk[-1]
+            if len(chunk) > 2 * self.CHUNK:
+                half = chunk[self.CHUNK:]
+                del chunk[self.CHUNK:]
+                self._chunks.insert(position + 1, half)
+                self._maxes.insert(position + 1, half[-1])
+                self._maxes[position] = chunk[-1]
+                self._owned.add(id(half))
+        self._len += 1
+
+    def discard(self, value):
+        position = bisect_left(self._maxes, value)
+        if position == len(self._chunks):
+            return
+        index = bisect_left(self._chunks[position], value)
+        if index == len(self._chunks[position]) or self._chunks[position][index] != value:
+            return
+        chunk = self._own(position)
+        del chunk[index]
+        if chunk:
+            self._maxes[position] = chunk[-1]
+        else:
+            self._owned.discard(id(chunk))
+            del self._chunks[position]
+            del self._maxes[position]
+        self._len -= 1
+
+    def bisect_left(self, value) -> int:
+        """How many values are less than value"""
+        position = bisect_left(self._maxes, value)
+        below = sum(len(chunk) for chunk in self._chunks[:position])
+        if position < len(self._chunks):
+            below += bisect_left(self._chunks[position], value)
+        return below
+
+    def head(self, limit: int) -> list:
+        """The first limit values"""
+        return list(islice(self, limit))
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(self._chunks)
+
+    def __len__(self) -> int:
+        return self._len
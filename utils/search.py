@@ -0,0 +1,202 @@
+"""Full-text search over tasks and clients.
+
+An inverted index maps each token to the documents containing it, with a
+field weight per document. A task document holds its title, description,
+meeting summary, links and comments; a client document holds its name,
+contact, notes and meeting summaries. Tokens are also kept in a sorted list
+so the last word of a query can match as a prefix via bisect.
+
+Tokenization lowercases, splits on non-word characters, strips Hebrew
+niqqud and cantillation marks and maps Hebrew final letters to their
+regular forms, so "שָׁלוֹם" and "שלום" (or "ם" and "מ") match.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+_WORD = re.compile(r"\w+")
+_HEBREW_MARKS = re.compile("[\u0591-\u05c7]")
+_HEBREW_FINALS = str.maketrans("ךםןףץ", "כמנפצ")
+
+# Weight of a token by the field it appears in
+TITLE_WEIGHT = 3.0
+TEXT_WEIGHT = 1.0
+
+# Score multiplier for a prefix (rather than exact) token match
+PREFIX_FACTOR = 0.5
+
+# Tokens a query prefix may expand to, the most common ones first
+MAX_PREFIX_TERMS = 100
+
+
+def tokenize(text: Optional[str]) -> list:
+    """Normalized word tokens of text"""
+    if not text:
+        return []
+    text = _HEBREW_MARKS.sub("", str(text)).casefold().translate(_HEBREW_FINALS)
+    return _WORD.findall(text)
+
+
+def _weights(fields: Iterable[tuple]) -> dict:
+    """token -> summed weight over (weight, text) fields"""
+    weights = {}
+    for weight, text in fields:
+        for token in tokenize(text):
+            weights[token] = weights.get(token, 0.0) + weight
+    return weights
+
+
+def comment_fields(comments: Iterable):
+    """Fields of comments (dicts or models, stored apart from their task)"""
+    for comment in comments:
+        yield TEXT_WEIGHT, comment.get("text")
+
+
+def meeting_fields(meetings: Iterable):
+    for meeting in meetings:
+        yield TEXT_WEIGHT, meeting.get("summary")
+        yield TEXT_WEIGHT, meeting.get("next_steps")
+
+
+def task_fields(task, comments: Iterable = ()):
+    """Fields of a task and its comments"""
+    yield TITLE_WEIGHT, task.title
+    yield TEXT_WEIGHT, task.description
+    yield TEXT_WEIGHT, task.meeting_summary
+    for link in task.links:
+        yield TEXT_WEIGHT, link
+    yield from comment_fields(comments)
+
+
+def client_fields(client, meetings: Iterable = ()):
+    yield TITLE_WEIGHT, client.name
+    yield TEXT_WEIGHT, client.contact_name
+    yield TEXT_WEIGHT, client.notes
+    yield from meeting_fields(meetings)
+
+
+class SearchIndex:
+    """Inverted index of task and client documents, keyed by (kind, id).
+
+    A document's comment or meeting fields are also kept apart, so the
+    task or client can be re-indexed, and new entries added, without
+    reading its whole history again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # token -> {doc key: weight}
+        self._documents = {}  # doc key -> {token: weight}
+        self._histories = {}  # doc key -> {token: weight} of its comment or meeting fields
+        self._tokens = []  # sorted vocabulary, for prefix lookups
+
+    def __len__(self):
+        return len(self._documents)
+
+    def index(self, kind: str, item_id: str, fields: Iterable[tuple], history: Optional[Iterable[tuple]] = None):
+        """Add or replace a document.
+
+        history, the fields of its comments or meetings, replaces those
+        indexed before; None keeps them.
+        """
+        weights = _weights(fields)
+        key = (kind, item_id)
+        with self._lock:
+            history_weights = self._histories.get(key, {}) if history is None else _weights(history)
+            self._put(key, weights, history_weights)
+
+    def add_history(self, kind: str, item_id: str, fields: Iterable[tuple]):
+        """Add the fields of new comments or meetings to an indexed document"""
+        key = (kind, item_id)
+        added = _weights(fields)
+        with self._lock:
+            if key not in self._documents:
+                return
+            weights = dict(self._documents[key])
+            history_weights = dict(self._histories.get(key, {}))
+            for token, weight in added.items():
+                weights[token] = weights.get(token, 0.0) + weight
+                history_weights[token] = history_weights.get(token, 0.0) + weight
+            self._drop(key)
+            self._documents[key] = weights
+            self._histories[key] = history_weights
+            self._post(key, weights)
+
+    def remove(self, kind: str, item_id: str):
+        with self._lock:
+            self._drop((kind, item_id))
+
+    def _put(self, key: tuple, weights: dict, history_weights: dict):
+        weights = dict(weights)
+        for token, weight in history_weights.items():
+            weights[token] = weights.get(token, 0.0) + weight
+        self._drop(key)
+        self._documents[key] = weights
+        if history_weights:
+            self._histories[key] = history_weights
+        self._post(key, weights)
+
+    def _post(self, key: tuple, weights: dict):
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._tokens, token)
+            postings[key] = weight
+
+    def _drop(self, key: tuple):
+        self._histories.pop(key, None)
+        for token in self._documents.pop(key, ()):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def _expand(self, prefix: str) -> list:
+        """Vocabulary tokens starting with prefix, other than prefix itself"""
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + "\U0010ffff", start)
+        terms = [t for t in self._tokens[start:end] if t != prefix]
+        if len(terms) > MAX_PREFIX_TERMS:
+            terms = sorted(terms, key=lambda t: len(self._postings[t]), reverse=True)[:MAX_PREFIX_TERMS]
+        return terms
+
+    def search(self, text: str, limit: int = 20) -> list:
+        """(kind, id, score) of documents matching every query word, best first.
+
+        The last word also matches as a prefix, so results follow typing.
+        """
+        words = tokenize(text)
+        if not words:
+            return []
+        with self._lock:
+            total = len(self._documents)
+            scores = None
+            for position, word in enumerate(words):
+                terms = [(word, 1.0)]
+                if position == len(words) - 1:
+                    terms += [(term, PREFIX_FACTOR) for term in self._expand(word)]
+                word_scores = {}
+                for term, factor in terms:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1.0 + total / len(postings))
+                    for key, weight in postings.items():
+                        if scores is not None and key not in scores:
+                            continue
+                        score = weight * idf * factor
+                        if score > word_scores.get(key, 0.0):
+                            word_scores[key] = score
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {key: scores[key] + score for key, score in word_scores.items()}
+                if not scores:
+                    return []
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(kind, item_id, score) for (kind, item_id), score in ranked]
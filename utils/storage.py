@@ -0,0 +1,664 @@
+"""Storage backends for the task store.
+
+A backend persists the document managed by data_manager. Every mutation
+reaches it as a compact record (see data_manager._apply) through append()
+or, for a committed transaction, append_many();
+save() replaces the whole document. Backends that can answer task queries
+natively implement query_task_ids(), others return None and data_manager
+filters in memory.
+
+Comments and meetings are not part of the document. Each task's comments
+and each client's meetings are kept as a separate append-only history,
+written from the same mutation records and read with history() only when
+someone opens them. The document's records carry a count and the time of
+the last entry instead.
+"""
+import contextlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, Iterator, Optional
+
+from utils import instrument, models
+from utils.helpers import parse_date
+
+try:
+    import fcntl
+except ImportError:  # No advisory locks (Windows): single-process deployments only
+    fcntl = None
+
+
+# History kind -> the mutation record op adding one entry, and that record's owner and entry keys
+HISTORY_OPS = {
+    "comments": ("comment.add", "task_id", "comment"),
+    "meetings": ("meeting.add", "client_id", "meeting"),
+}
+
+
+def history_changes(record: dict):
+    """(kind, owner id, entries) a mutation record adds, and the (kind, owner id) it deletes"""
+    op = record["op"]
+    for kind, (add_op, owner_key, entry_key) in HISTORY_OPS.items():
+        if op == add_op:
+            return (kind, record[owner_key], [record[entry_key]]), None
+    if op in ("task.add", "client.add"):
+        # Restored records (from the archive) bring their history along
+        item = record["task" if op == "task.add" else "client"]
+        kind = "comments" if op == "task.add" else "meetings"
+        entries = item.get(kind)
+        return ((kind, item["id"], list(entries)) if entries else None), None
+    if op == "task.delete":
+        return None, ("comments", record["id"])
+    if op == "client.delete":
+        return None, ("meetings", record["id"])
+    return None, None
+
+
+def _encode(value):
+    """JSON fallback: records held as models (utils.models) via to_dict, anything else as a string"""
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if to_dict is not None else str(value)
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, re-entrant within the process"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a")
+                if fcntl is not None:
+                    fcntl.flock(self._file, fcntl.LOCK_EX)
+            except OSError:
+                self._file = None  # Read-only filesystem, nobody else can write either
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+class Storage:
+    # Held by data_manager around every write and every read of another process's writes
+    lock = contextlib.nullcontext()
+
+    def load(self) -> dict:
+        raise NotImplementedError
+
+    def append(self, record: dict, document: Optional[Callable[[], dict]] = None):
+        self.append_many([record], document)
+
+    def append_many(self, records: list, document: Optional[Callable[[], dict]] = None):
+        """Durably write several mutation records at once, all or none of them.
+
+        document, when given, returns the whole document with the records
+        applied. Backends may write it out instead of replaying their records.
+        """
+        raise NotImplementedError
+
+    def save(self, data: dict, history: Optional[dict] = None):
+        """Replace the document.
+
+        Comment and meeting lists still nested in its records (older
+        documents, backups) replace those histories, and so does history,
+        {kind: {owner id: entries}}, when given. data is left with summaries.
+        """
+        raise NotImplementedError
+
+    def history(self, kind: str, owner_id: str) -> list:
+        """A task's "comments" or a client's "meetings" as dicts, oldest first"""
+        raise NotImplementedError
+
+    def history_items(self, kind: str) -> Iterator[tuple]:
+        """(owner id, entries) of every stored history of a kind"""
+        raise NotImplementedError
+
+    def compact(self):
+        pass
+
+    def signature(self):
+        """Changes whenever another process writes to the storage"""
+        return None
+
+    def changes_since(self, signature) -> Optional[Iterator[dict]]:
+        """Mutation records written after signature, or None when only a full load() will do"""
+        return None
+
+    def query_task_ids(self, filters: dict, sort_by: Optional[str] = None) -> Optional[list]:
+        return None
+
+
+def _merge_histories(history: dict, more: dict):
+    for kind, owners in more.items():
+        for owner_id, entries in owners.items():
+            history.setdefault(kind, {}).setdefault(owner_id, []).extend(entries)
+
+
+class JsonLogStorage(Storage):
+    """tasks.json snapshot plus an append-only JSON-lines mutation log.
+
+    Histories are JSON-lines files, one per task or client, under history_dir.
+    """
+
+    # The log is folded into the snapshot once it outgrows both this floor and
+    # the snapshot itself, so compaction cost stays amortized per appended byte.
+    LOG_COMPACT_BYTES = 1024 * 1024
+
+    def __init__(self, data_file: str, log_file: str, history_dir: str,
+                 replay: Callable[[dict, Iterator[dict]], None], default: Callable[[], dict]):
+        self.data_file = data_file
+        self.log_file = log_file
+        self.history_dir = history_dir
+        self._replay = replay
+        self._default = default
+        self._lock = threading.Lock()
+        self.lock = FileLock(data_file + ".lock")
+
+    def load(self) -> dict:
+        """Read the snapshot and replay the mutation log on top of it"""
+        data = None
+        if os.path.exists(self.data_file):
+            try:
+                with open(self.data_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+        if data is None:
+            data = self._default()
+        history = models.split_histories(data)
+        if not any(history.values()):
+            self._replay(data, self._read_log())
+            return data
+
+        # A document from before histories moved out: the log's entries were only kept inline too
+        records = list(self._read_log())
+        for record in records:
+            added, _deleted = history_changes(record)
+            if added is not None:
+                kind, owner_id, entries = added
+                history[kind].setdefault(owner_id, []).extend(entries)
+        self._replay(data, records)
+        try:
+            self._replace_histories(history)
+            self._write_snapshot(data)
+            self._drop_orphan_histories(data)
+        except OSError:
+            pass  # On read-only filesystem the histories stay inline in the snapshot
+        return data
+
+    def _read_log(self, offset: int = 0) -> Iterator[dict]:
+        try:
+            with open(self.log_file, "rb") as f:
+                f.seek(offset)
+                replayed = offset
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if record.get("op") == "batch":
+                        yield from record["records"]
+                    else:
+                        yield record
+                    replayed += len(line)
+            if replayed < os.path.getsize(self.log_file):
+                # Drop the torn tail of an interrupted append so new records start on a clean line
+                with open(self.log_file, "r+b") as f:
+                    f.truncate(replayed)
+        except FileNotFoundError:
+            pass
+
+    def _write_snapshot(self, data: dict):
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        tmp_file = self.data_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=_encode)
+            f.flush()
+            os.fsync(f.fileno())
+            instrument.count("storage.snapshot_bytes", f.tell())
+        os.replace(tmp_file, self.data_file)
+        # Replay is idempotent, so a crash before this truncate only re-applies records
+        open(self.log_file, "w").close()
+
+    _SAFE_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+    def _history_path(self, kind: str, owner_id: str) -> str:
+        # Ids are uuids, anything else is hex-encoded so it can't escape the directory
+        name = owner_id if self._SAFE_NAME.fullmatch(owner_id) else "~" + owner_id.encode("utf-8").hex()
+        return os.path.join(self.history_dir, kind, name + ".jsonl")
+
+    @staticmethod
+    def _history_owner(file_name: str) -> str:
+        name = file_name[:-len(".jsonl")]
+        return bytes.fromhex(name[1:]).decode("utf-8") if name.startswith("~") else name
+
+    @staticmethod
+    def _history_lines(entries: list) -> str:
+        return "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=_encode) + "\n"
+                       for entry in entries)
+
+    def _read_history(self, path: str) -> list:
+        entries = {}
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Torn tail of an interrupted append
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    # An append retried after a crash may repeat entries
+                    entries.setdefault(entry.get("id"), entry)
+        except FileNotFoundError:
+            pass
+        return list(entries.values())
+
+    def history(self, kind: str, owner_id: str) -> list:
+        return self._read_history(self._history_path(kind, owner_id))
+
+    def history_items(self, kind: str) -> Iterator[tuple]:
+        directory = os.path.join(self.history_dir, kind)
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".jsonl"):
+                yield self._history_owner(name), self._read_history(os.path.join(directory, name))
+
+    def _append_history(self, kind: str, owner_id: str, entries: list):
+        path = self._history_path(kind, owner_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            start = f.tell()
+            f.write(self._history_lines(entries))
+            f.flush()
+            os.fsync(f.fileno())
+            instrument.count("storage.history_bytes", f.tell() - start)
+
+    def _replace_histories(self, history: dict):
+        for kind, owners in history.items():
+            for owner_id, entries in owners.items():
+                path = self._history_path(kind, owner_id)
+                if not entries:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(self._history_lines(entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + ".tmp", path)
+
+    def _drop_orphan_histories(self, data: dict):
+        for kind, key in (("comments", "tasks"), ("meetings", "clients")):
+            owners = {item["id"] for item in data.get(key, [])}
+            for owner_id, _entries in list(self.history_items(kind)):
+                if owner_id not in owners:
+                    os.remove(self._history_path(kind, owner_id))
+
+    def save(self, data: dict, history: Optional[dict] = None):
+        nested = models.split_histories(data)
+        if history:
+            _merge_histories(nested, history)
+        with self._lock:
+            self._replace_histories(nested)
+            self._write_snapshot(data)
+            self._drop_orphan_histories(data)
+
+    def signature(self):
+        stamps = []
+        for path in (self.data_file, self.log_file):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def changes_since(self, signature) -> Optional[Iterator[dict]]:
+        if not signature:
+            return None
+        snapshot, log = self.signature()
+        old_snapshot, old_log = signature
+        offset = old_log[1] if old_log else 0
+        # A new snapshot means a compaction happened, the old log offset is meaningless
+        if snapshot != old_snapshot or log is None or log[1] < offset:
+            return None
+        return self._read_log(offset)
+
+    def compact(self):
+        """Fold the mutation log into the snapshot"""
+        with self._lock:
+            self._write_snapshot(self.load())
+
+    def append_many(self, records: list, document: Optional[Callable[[], dict]] = None):
+        # A transaction is one log line, so a torn write drops all of it rather than its tail
+        record = records[0] if len(records) == 1 else {"op": "batch", "records": records}
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_encode) + "\n"
+        added, deleted = [], []
+        for record in records:
+            add, delete = history_changes(record)
+            if add is not None:
+                added.append(add)
+            if delete is not None:
+                deleted.append(delete)
+        with self._lock:
+            # Entries are durable before the records counting them, deletions only after
+            for kind, owner_id, entries in added:
+                self._append_history(kind, owner_id, entries)
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                start = f.tell()
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                log_size = f.tell()
+            re_added = {(kind, owner_id) for kind, owner_id, _entries in added}
+            for kind, owner_id in deleted:
+                if (kind, owner_id) not in re_added:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self._history_path(kind, owner_id))
+        instrument.count("storage.log_bytes", log_size - start)
+        snapshot_size = os.path.getsize(self.data_file) if os.path.exists(self.data_file) else 0
+        if log_size > max(self.LOG_COMPACT_BYTES, snapshot_size):
+            if document is None:
+                self.compact()
+            else:
+                with self._lock:
+                    self._write_snapshot(document())
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS partners (position INTEGER PRIMARY KEY, name TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS categories (position INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    status TEXT,
+    assignee TEXT,
+    priority TEXT,
+    category TEXT,
+    client TEXT,
+    due_date TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks(assignee);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_client ON tasks(client);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+CREATE TABLE IF NOT EXISTS comments (id TEXT PRIMARY KEY, task_id TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_comments_task ON comments(task_id);
+CREATE TABLE IF NOT EXISTS clients (id TEXT PRIMARY KEY, name TEXT, status TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_clients_status ON clients(status);
+CREATE TABLE IF NOT EXISTS meetings (id TEXT PRIMARY KEY, client_id TEXT NOT NULL, date TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_meetings_client ON meetings(client_id);
+"""
+
+_TASK_ORDER = {
+    "due_date": "due_date IS NULL, due_date",
+    "priority": "CASE priority WHEN 'High' THEN 0 WHEN 'Low' THEN 2 ELSE 1 END",
+    "priority_due": "CASE priority WHEN 'High' THEN 0 WHEN 'Low' THEN 2 ELSE 1 END, due_date IS NULL, due_date",
+    "created": "created_at DESC",
+    "title": "title COLLATE NOCASE",
+    "client": "client COLLATE NOCASE",
+}
+
+# query_task_ids filters, each backed by an indexed column
+_TASK_FILTERS = ("status", "assignee", "priority", "category", "client")
+
+
+# PRAGMA user_version once stored due dates are normalized
+_SCHEMA_VERSION = 1
+
+
+def _due_date(value) -> Optional[str]:
+    """ISO date for the due_date column, so it sorts like the JSON backend's due ordinal"""
+    parsed = parse_date(value)
+    return parsed.isoformat() if parsed else None
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_encode)
+
+
+class SqliteStorage(Storage):
+    """stdlib sqlite3 backend in WAL journal mode, one row per record"""
+
+    def __init__(self, db_file: str):
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.lock = FileLock(db_file + ".lock")
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs the WAL on every commit; NORMAL could lose the last commits on power loss
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        with self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+                return
+            rows = self._conn.execute("SELECT id, due_date FROM tasks WHERE due_date IS NOT NULL").fetchall()
+            self._conn.executemany("UPDATE tasks SET due_date = ? WHERE id = ?",
+                                   [(_due_date(due), task_id) for task_id, due in rows if _due_date(due) != due])
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0] == 0
+
+    def _summaries(self, table: str, owner: str) -> dict:
+        return {
+            owner_id: (count, last)
+            for owner_id, count, last in self._conn.execute(
+                f"SELECT {owner}, COUNT(*), MAX(json_extract(data, '$.created_at')) FROM {table} GROUP BY {owner}"
+            )
+        }
+
+    def load(self) -> dict:
+        with self._lock:
+            conn = self._conn
+            # Summaries come from the history tables, so they can't drift from them
+            comments = self._summaries("comments", "task_id")
+            meetings = self._summaries("meetings", "client_id")
+
+            tasks = []
+            for task_id, raw in conn.execute("SELECT id, data FROM tasks ORDER BY rowid"):
+                task = json.loads(raw)
+                task["comment_count"], task["last_comment_at"] = comments.get(task_id, (0, None))
+                tasks.append(task)
+            clients = []
+            for client_id, raw in conn.execute("SELECT id, data FROM clients ORDER BY rowid"):
+                client = json.loads(raw)
+                client["meeting_count"], client["last_meeting_at"] = meetings.get(client_id, (0, None))
+                clients.append(client)
+            return {
+                "partners": [json.loads(raw) for (raw,) in conn.execute("SELECT data FROM partners ORDER BY position")],
+                "tasks": tasks,
+                "clients": clients,
+                "categories": [name for (name,) in conn.execute("SELECT name FROM categories ORDER BY position")],
+            }
+
+    def _put_task(self, task: dict):
+        row = {k: v for k, v in task.items() if k != "comments"}
+        self._conn.execute(
+            "INSERT INTO tasks (id, title, status, assignee, priority, category, client, due_date, created_at, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET title=excluded.title, status=excluded.status,"
+            " assignee=excluded.assignee, priority=excluded.priority, category=excluded.category,"
+            " client=excluded.client, due_date=excluded.due_date, created_at=excluded.created_at,"
+            " data=excluded.data",
+            (row["id"], row.get("title"), row.get("status"), row.get("assignee"), row.get("priority"),
+             row.get("category"), row.get("client"), _due_date(row.get("due_date")), row.get("created_at"), _dumps(row))
+        )
+
+    def _put_client(self, client: dict):
+        row = {k: v for k, v in client.items() if k != "meetings"}
+        self._conn.execute(
+            "INSERT INTO clients (id, name, status, data) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET name=excluded.name, status=excluded.status, data=excluded.data",
+            (row["id"], row.get("name"), row.get("status"), _dumps(row))
+        )
+
+    def _put_comments(self, task_id: str, comments: list):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO comments (id, task_id, data) VALUES (?, ?, ?)",
+            [(c["id"], task_id, _dumps(c)) for c in comments]
+        )
+
+    def _put_meetings(self, client_id: str, meetings: list):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO meetings (id, client_id, date, data) VALUES (?, ?, ?, ?)",
+            [(m["id"], client_id, m.get("date"), _dumps(m)) for m in meetings]
+        )
+
+    def _put_partners(self, partners: list):
+        self._conn.execute("DELETE FROM partners")
+        self._conn.executemany(
+            "INSERT INTO partners (position, name, data) VALUES (?, ?, ?)",
+            [(i, p if isinstance(p, str) else p["name"], _dumps(p)) for i, p in enumerate(partners)]
+        )
+
+    def _merge(self, table: str, row_id: str, updates: dict) -> Optional[dict]:
+        found = self._conn.execute(f"SELECT data FROM {table} WHERE id = ?", (row_id,)).fetchone()
+        if found is None:
+            return None
+        row = json.loads(found[0])
+        row.update(updates)
+        return row
+
+    def _apply(self, record: dict):
+        op = record["op"]
+        conn = self._conn
+        # Per-record version stamped by data_manager on updates, comments and meetings
+        version = {"version": record["version"]} if "version" in record else {}
+        if op == "task.add":
+            self._put_task(record["task"])
+            self._put_comments(record["task"]["id"], record["task"].get("comments", []))
+        elif op == "task.update":
+            task = self._merge("tasks", record["id"], dict(record["updates"], **version))
+            if task is not None:
+                self._put_task(task)
+        elif op == "task.delete":
+            conn.execute("DELETE FROM tasks WHERE id = ?", (record["id"],))
+            conn.execute("DELETE FROM comments WHERE task_id = ?", (record["id"],))
+        elif op == "comment.add":
+            task = self._merge("tasks", record["task_id"], dict(updated_at=record["comment"]["created_at"], **version))
+            if task is not None:
+                self._put_task(task)
+                self._put_comments(record["task_id"], [record["comment"]])
+        elif op == "partners.set":
+            self._put_partners(record["partners"])
+        elif op == "client.add":
+            self._put_client(record["client"])
+            self._put_meetings(record["client"]["id"], record["client"].get("meetings", []))
+        elif op == "client.update":
+            client = self._merge("clients", record["id"], dict(record["updates"], **version))
+            if client is not None:
+                self._put_client(client)
+        elif op == "client.delete":
+            conn.execute("DELETE FROM clients WHERE id = ?", (record["id"],))
+            conn.execute("DELETE FROM meetings WHERE client_id = ?", (record["id"],))
+        elif op == "meeting.add":
+            client = self._merge("clients", record["client_id"], dict(updated_at=record["meeting"]["created_at"], **version))
+            if client is not None:
+                self._put_client(client)
+                self._put_meetings(record["client_id"], [record["meeting"]])
+
+    def append_many(self, records: list, document: Optional[Callable[[], dict]] = None):
+        with self._lock, self._conn:
+            for record in records:
+                self._apply(record)
+
+    def save(self, data: dict, history: Optional[dict] = None):
+        nested = models.split_histories(data)
+        if history:
+            _merge_histories(nested, history)
+        with self._lock, self._conn:
+            conn = self._conn
+            for table in ("tasks", "clients", "categories"):
+                conn.execute(f"DELETE FROM {table}")
+            self._put_partners(data.get("partners", []))
+            conn.executemany(
+                "INSERT INTO categories (position, name) VALUES (?, ?)",
+                list(enumerate(data.get("categories", [])))
+            )
+            for task in data.get("tasks", []):
+                self._put_task(task)
+            for client in data.get("clients", []):
+                self._put_client(client)
+
+            conn.execute("DELETE FROM comments WHERE task_id NOT IN (SELECT id FROM tasks)")
+            conn.execute("DELETE FROM meetings WHERE client_id NOT IN (SELECT id FROM clients)")
+            for task_id, comments in nested["comments"].items():
+                conn.execute("DELETE FROM comments WHERE task_id = ?", (task_id,))
+                self._put_comments(task_id, comments)
+            for client_id, meetings in nested["meetings"].items():
+                conn.execute("DELETE FROM meetings WHERE client_id = ?", (client_id,))
+                self._put_meetings(client_id, meetings)
+
+    def history(self, kind: str, owner_id: str) -> list:
+        owner = "task_id" if kind == "comments" else "client_id"
+        with self._lock:
+            return [json.loads(raw) for (raw,) in self._conn.execute(
+                f"SELECT data FROM {kind} WHERE {owner} = ? ORDER BY rowid", (owner_id,)
+            )]
+
+    def history_items(self, kind: str) -> Iterator[tuple]:
+        owner = "task_id" if kind == "comments" else "client_id"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {owner}, data FROM {kind} ORDER BY {owner}, rowid").fetchall()
+        for owner_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield owner_id, [json.loads(raw) for _owner_id, raw in group]
+
+    def compact(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def signature(self):
+        # data_version only moves when other connections commit
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def query_task_ids(self, filters: dict, sort_by: Optional[str] = None) -> Optional[list]:
+        clauses, params = [], []
+        for column in _TASK_FILTERS:
+            values = filters.get(column)
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        sql = "SELECT id FROM tasks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        order = _TASK_ORDER.get(sort_by)
+        # id breaks ties so the order, and therefore each page, is stable across reruns
+        sql += f" ORDER BY {order}, id" if order else " ORDER BY rowid"
+        with self._lock:
+            return [task_id for (task_id,) in self._conn.execute(sql, params)]